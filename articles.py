@@ -0,0 +1,62 @@
+# articles.py
+"""
+Reading and sentence-splitting the raw news articles
+(input_data/News Articles/<source>/<n>.txt), shared by the seed sampler and
+the full-corpus labeling job so both segment text the same way.
+"""
+import csv
+import os
+import re
+
+from nltk.tokenize import sent_tokenize
+
+DATA_DIR = "input_data/News Articles"
+
+
+def clean_article(text):
+    text = re.sub(r"<<\s*to continue reading.*?>>", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\n{2,}", "\n\n", text)
+    return text.strip()
+
+
+def split_into_sentences(text):
+    paras = text.split("\n\n")
+    sents = []
+    for para in paras:
+        para = para.strip()
+        if not para:
+            continue
+        for sent in sent_tokenize(para):
+            sent = sent.strip()
+            if sent:
+                sents.append(sent)
+    return sents
+
+
+def read_article(path):
+    with open(path, encoding="latin-1", errors="ignore") as f:
+        return f.read()
+
+
+def list_articles(data_dir=DATA_DIR):
+    """[(source, filename, path)] in a stable order (source, then article number)."""
+    out = []
+    for source in sorted(os.listdir(data_dir)):
+        src_dir = os.path.join(data_dir, source)
+        if not os.path.isdir(src_dir):
+            continue
+        files = [f for f in os.listdir(src_dir) if f.endswith(".txt")]
+        files.sort(key=lambda f: (len(f), f))      # 2.txt before 10.txt
+        out.extend((source, fname, os.path.join(src_dir, fname)) for fname in files)
+    return out
+
+
+def load_dates(manifest_csv):
+    """
+    {(source, filename): date} from generate_manifest.py's manifest; an
+    article without a PUBLISHED: date (an empty cell) maps to None.
+    """
+    if not os.path.exists(manifest_csv):
+        return {}
+    with open(manifest_csv, newline="", encoding="utf8") as f:
+        return {(row["source"], row["filename"]): row["date"] or None for row in csv.DictReader(f)}
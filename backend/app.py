@@ -1,40 +1,139 @@
 # app.py
-import json
+import base64
+import binascii
+import logging
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
 
+import orjson
 from flask_cors import CORS
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, g, request, jsonify, abort
+
+from dataset import Dataset
+from snapshot import snapshot_dir_for
+from cache import ResponseCache, make_etag
+from cubes import GROUP_DIMS
+from index import ENTITY_NORMALIZER, SORT_KEYS
+from inference import LivePredictor
+from metrics import configure_logging, init_app as init_metrics, log, timed, timings
 
 # ——————————————————————————————————————————
 # 1) CONFIG
 # ——————————————————————————————————————————
 JSONL_PATH = "../bootstrapped_labels_2.0.jsonl"  
 # or "bootstrapped_labels_2.0.jsonl", etc.
+# Compiled by `python snapshot.py`; mapped at start instead of parsing the
+# JSONL, which is only re-read when it has changed since.
+SNAPSHOT_DIR = snapshot_dir_for(JSONL_PATH)
+
+# Poll JSONL_PATH this often (seconds) and reload it when it changes; 0 = off.
+# POST /admin/reload works either way.
+RELOAD_INTERVAL = float(os.environ.get("PREDICTIONS_RELOAD_INTERVAL", 5))
+# Serialized /predictions bodies kept for repeated filter combinations.
+RESPONSE_CACHE_SIZE = 256
+# /admin/* requests must send it in the X-Admin-Token header; unset = the
+# /admin/* routes are disabled (404).
+ADMIN_TOKEN = os.environ.get("PREDICTIONS_ADMIN_TOKEN")
+
+# Fine-tuned models behind POST /infer (loaded on the first request).
+NER_MODEL_DIR = "../ner-finetuned/"
+STANCE_MODEL_DIR = "../stance-finetuned/"
+# Concurrent /infer texts are run together: a batch is sent to the models when
+# it has INFER_MAX_BATCH texts or INFER_MAX_WAIT_MS after its first text.
+INFER_MAX_BATCH = 32
+INFER_MAX_WAIT_MS = 10
+INFER_MAX_TEXTS = 64        # per request
+INFER_TIMEOUT = 60          # seconds
+# "onnx" serves the <model dir>-onnx/ exports (python onnx_backend.py export)
+# with ONNX Runtime instead of the torch pipelines.
+INFER_BACKEND = os.environ.get("PREDICTIONS_INFER_BACKEND", "torch")
 
 # Valid filter keys / allowed values
 VALID_STANCES = {"STANCE_POS", "STANCE_NEG", "STANCE_NEU"}
 VALID_ENTITY_LABELS = {"PER", "LOC", "ORG", "EVENT"}  # update to your schema
+VALID_SORTS = set(SORT_KEYS) | {"-" + key for key in SORT_KEYS}
+NDJSON_MIMETYPE = "application/x-ndjson"
+# span label -> the entity value the API speaks (PERSON -> PER)
+ENTITY_LABELS = {v: k for k, v in ENTITY_NORMALIZER.items()}
 
 # ——————————————————————————————————————————
 # 2) LOAD DATA
 # ——————————————————————————————————————————
-def load_predictions(path):
-    preds = []
-    with open(path, encoding="utf8") as f:
-        for line in f:
-            rec = json.loads(line)
-            # sanity‐check shape:
-            if "text" not in rec or "metadata" not in rec:
-                continue
-            preds.append(rec)
-    return preds
-
-all_predictions = load_predictions(JSONL_PATH)
+def encode_cursor(sort, pos, epoch):
+    """Opaque cursor for 'everything after record `pos` in the `sort` order'."""
+    payload = f"{sort or ''}|{pos}|{epoch}"
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, sort, snap):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        cursor_sort, pos, epoch = base64.urlsafe_b64decode(padded).decode().split("|")
+        pos, epoch = int(pos), int(epoch)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        abort(400, f"Invalid cursor: {cursor}")
+    if cursor_sort != (sort or ""):
+        abort(400, "Cursor was issued for a different sort order")
+    if epoch != snap.epoch or not 0 <= pos < len(snap.store):
+        abort(410, "Cursor expired: the predictions file was rewritten, start over")
+    return pos
+
+def project(rec, fields):
+    """Keep only `fields` of a record; "metadata.source" style paths select sub-keys."""
+    out = {}
+    for field in fields:
+        parent, _, child = field.partition(".")
+        if parent not in rec:
+            continue
+        if not child:
+            out[parent] = rec[parent]
+        elif isinstance(rec[parent], dict) and child in rec[parent]:
+            out.setdefault(parent, {})[child] = rec[parent][child]
+    return out
+
+def stream_ndjson(store, positions, fields=None):
+    """
+    One JSON document per line, serialized as each row is rebuilt.
+    The time spent here is only known once the stream is drained, so it is
+    recorded straight into the metrics rather than the request's timings.
+    """
+    spent = 0.0
+    try:
+        for pos in positions:
+            start = time.perf_counter()
+            rec = store.record(pos)
+            if fields:
+                rec = project(rec, fields)
+            line = orjson.dumps(rec) + b"\n"
+            spent += time.perf_counter() - start
+            yield line
+    finally:
+        timings.observe("get_predictions", "serialize", spent * 1000)
+
+configure_logging()
+
+# columnar store + indexes; swapped atomically whenever JSONL_PATH changes
+dataset = Dataset(JSONL_PATH, snapshot_dir=SNAPSHOT_DIR)
 
 # ——————————————————————————————————————————
 # 3) FLASK APP
 # ——————————————————————————————————————————
 app = Flask(__name__)
-CORS(app) 
+CORS(app, expose_headers=["X-Total-Count", "X-Next-Cursor", "ETag"])
+response_cache = ResponseCache(maxsize=RESPONSE_CACHE_SIZE)
+predictor = LivePredictor(
+    NER_MODEL_DIR, STANCE_MODEL_DIR, INFER_MAX_BATCH, INFER_MAX_WAIT_MS, backend=INFER_BACKEND
+)
+init_metrics(app)
+
+
+@app.before_request
+def ensure_watcher():
+    # started lazily so that under serve.py each forked worker runs its own
+    # watcher and the preloading master never does
+    if RELOAD_INTERVAL > 0:
+        dataset.watch(RELOAD_INTERVAL)
+
 
 @app.route("/predictions", methods=["GET"])
 def get_predictions():
@@ -45,64 +144,261 @@ def get_predictions():
       - stances     : one of VALID_STANCES
       - min_score  : float (0-1), default 0
       - limit      : int, max number of records to return (default 100)
+      - sort       : one of VALID_SORTS (source, date, score; "-" prefix for
+                     descending), default file order
+      - fields     : comma-separated keys to return, e.g. "text,stance,metadata.source"
+      - cursor     : `next_cursor` from a previous response, to fetch the next page
+      - format     : "ndjson" to stream one record per line (same as sending
+                     `Accept: application/x-ndjson`)
+
+    Returns {"results": [...], "total": <matches overall>, "next_cursor": str | null}.
+    In NDJSON mode `total` and `next_cursor` travel in the X-Total-Count and
+    X-Next-Cursor headers, and rows are written as soon as they are encoded.
+
+    Responses carry an ETag derived from the loaded data and the normalized
+    query; a matching If-None-Match gets a 304 before any filtering. JSON
+    bodies are kept in an LRU so a repeated query skips filtering and
+    serialization entirely.
     """
     src    = request.args.get("source", type=str)
     ent    = request.args.get("entities", type=str)
     stance = request.args.get("stances", type=str)
     min_sc = request.args.get("min_score", default=0.0, type=float)
     limit  = request.args.get("limit", default=100, type=int)
-    ENTITY_NORMALIZER = {
-    "PER":   "PERSON",
-    "LOC":   "LOC",
-    "ORG":   "ORG",
-    "EVENT": "EVENT",
-}
+    sort   = request.args.get("sort", type=str)
+    fields = request.args.get("fields", type=str)
+    cursor = request.args.get("cursor", type=str)
+    fmt    = request.args.get("format", type=str)
 
     # validate
     if ent and ent not in VALID_ENTITY_LABELS:
         abort(400, f"Unknown entity label: {ent}")
     if stance and stance not in VALID_STANCES:
         abort(400, f"Unknown stance: {stance}")
+    if sort and sort not in VALID_SORTS:
+        abort(400, f"Unknown sort: {sort}")
+    if fmt and fmt not in ("json", "ndjson"):
+        abort(400, f"Unknown format: {fmt}")
+    if not fmt:
+        best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+        fmt = "ndjson" if best == NDJSON_MIMETYPE else "json"
 
-    # filter in‑memory
-    results = []
-    for rec in all_predictions:
-        # 1) source filter
-        if src and rec["metadata"].get("source") != src:
-            continue
+    # answer from the current snapshot; hold on to it for the whole request
+    # so a reload cannot swap it out halfway
+    snap = dataset.current()
+    wanted = sorted({f.strip() for f in fields.split(",") if f.strip()}) if fields else None
+    key = (src or None, ent or None, stance or None, min_sc, max(limit, 1),
+           sort or None, tuple(wanted) if wanted else None, cursor or None, fmt)
+    etag = make_etag(snap.fingerprint, key)
+    if request.if_none_match.contains(etag):
+        g.cache = "not-modified"
+        return _conditional(Response(status=304), etag)
 
-        # 2) stance filter
-        if stance and rec.get("stance") != stance:
-            continue
+    if fmt == "json":
+        body = response_cache.get(snap.fingerprint, key)
+        if body is not None:
+            g.cache = "hit"
+            return _conditional(Response(body, mimetype="application/json"), etag)
+        g.cache = "miss"
+
+    # inverted indexes built at load time
+    normalized_ent = ENTITY_NORMALIZER[ent] if ent else None
+    with timed("filter"):
+        positions, total, last = snap.index.page(
+            after=decode_cursor(cursor, sort, snap) if cursor else None,
+            limit=max(limit, 1),
+            sort=sort,
+            source=src,
+            stance=stance,
+            entity=normalized_ent,
+            min_score=min_sc,
+        )
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("predictions key=%r version=%d matched=%d page=%d", key, snap.version, total, len(positions))
+    next_cursor = encode_cursor(sort, last, snap.epoch) if last is not None else None
+
+    if fmt == "ndjson":
+        headers = {"X-Total-Count": str(total)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        resp = Response(
+            stream_ndjson(snap.store, positions, wanted),
+            mimetype=NDJSON_MIMETYPE,
+            headers=headers,
+        )
+        return _conditional(resp, etag)
+
+    with timed("serialize"):
+        results = snap.store.records(positions)
+        if wanted:
+            results = [project(rec, wanted) for rec in results]
+
+        body = orjson.dumps({
+            "results": results,
+            "total": total,
+            "next_cursor": next_cursor,
+        }, option=orjson.OPT_SORT_KEYS)
+    response_cache.put(snap.fingerprint, key, body)
+    return _conditional(Response(body, mimetype="application/json"), etag)
 
-        # 3) score filter
-        if rec.get("score", 0.0) < min_sc:
-            continue
 
-        # 4) entity filter: pass if any span.label matches
-        print("Ent is: ", ent)
-        if ent:
-            if ent not in ENTITY_NORMALIZER:
-                abort(400, f"Unknown entity label: {ent}")
-            normalized_ent = ENTITY_NORMALIZER[ent]
-        else:
-            normalized_ent = None
+def _conditional(resp, etag):
+    """Let clients revalidate with If-None-Match instead of refetching."""
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
-        print( "Normalized ent is: ", normalized_ent)
-        if normalized_ent:
-            spans = rec.get("spans", [])
-            print("Spans are: ", spans)
-            if not any(s.get("label") == normalized_ent for s in spans):
-                print("Skipping over entity filter")
-                continue
-            else:
-                print("it found one match....")
 
-        results.append(rec)
-        if len(results) >= limit:
-            break
+@app.route("/aggregate", methods=["GET"])
+def get_aggregate():
+    """
+    Sentence counts and mean score from the precomputed cubes.
+
+    Query parameters:
+      - by       : comma-separated subset of GROUP_DIMS (source, stance, entity),
+                   default "source,stance"
+      - source   : restrict to one metadata.source
+      - stances  : one of VALID_STANCES
+      - entities : one of VALID_ENTITY_LABELS; counts sentences mentioning it
+
+    With "entity" in `by` (or an `entities` filter), a sentence counts once
+    per entity label it mentions.
+    """
+    by = request.args.get("by", default="source,stance", type=str)
+    src = request.args.get("source", type=str)
+    stance = request.args.get("stances", type=str)
+    ent = request.args.get("entities", type=str)
+
+    dims = [d.strip() for d in by.split(",") if d.strip()]
+    unknown = [d for d in dims if d not in GROUP_DIMS]
+    if unknown:
+        abort(400, f"Unknown group-by dimension: {unknown[0]}")
+    if ent and ent not in VALID_ENTITY_LABELS:
+        abort(400, f"Unknown entity label: {ent}")
+    if stance and stance not in VALID_STANCES:
+        abort(400, f"Unknown stance: {stance}")
+
+    snap = dataset.current()
+    with timed("filter"):
+        groups = snap.cubes.groups(
+            dims,
+            source=src or None,
+            stance=stance or None,
+            label=ENTITY_NORMALIZER[ent] if ent else None,
+        )
+    for row in groups:
+        if "entity" in row:
+            row["entity"] = ENTITY_LABELS.get(row["entity"], row["entity"])
+    return jsonify({"by": dims, "groups": groups, "version": snap.version})
+
+
+@app.route("/aggregate/entities", methods=["GET"])
+def get_entity_stances():
+    """
+    Stance distribution per entity text (e.g. how each source talks about
+    one person), most mentioned first.
+
+    Query parameters:
+      - entities : one of VALID_ENTITY_LABELS
+      - source   : restrict to one metadata.source
+      - top      : int, number of entities to return (default 20)
+    """
+    ent = request.args.get("entities", type=str)
+    src = request.args.get("source", type=str)
+    top = request.args.get("top", default=20, type=int)
+
+    if ent and ent not in VALID_ENTITY_LABELS:
+        abort(400, f"Unknown entity label: {ent}")
+
+    snap = dataset.current()
+    with timed("filter"):
+        rows = snap.cubes.entity_stances(
+            label=ENTITY_NORMALIZER[ent] if ent else None,
+            source=src or None,
+            top=max(top, 0),
+        )
+    for row in rows:
+        row["label"] = ENTITY_LABELS.get(row["label"], row["label"])
+    return jsonify({"entities": rows, "version": snap.version})
+
+
+@app.route("/infer", methods=["POST"])
+def infer():
+    """
+    Run NER + stance on new text: {"text": "..."} or {"texts": ["...", ...]}.
+    Results have the shape of the /predictions records (spans, stance, score).
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400, "Expected a JSON object with `text` or `texts`")
+    texts = body.get("texts", [body["text"]] if "text" in body else None)
+    if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+        abort(400, "`text` must be a string or `texts` a non-empty list of strings")
+    if len(texts) > INFER_MAX_TEXTS:
+        abort(413, f"At most {INFER_MAX_TEXTS} texts per request")
+
+    with timed("infer"):
+        try:
+            results = predictor.predict(texts, timeout=INFER_TIMEOUT)
+        except (ImportError, OSError) as e:
+            # transformers / onnxruntime missing, or models not trained / exported yet
+            log.warning("inference unavailable: %s", e)
+            abort(503, "Inference models are not available")
+        except FutureTimeout:
+            abort(504, "Inference timed out")
+    if "text" in body and "texts" not in body:
+        return jsonify(results[0])
+    return jsonify({"results": results})
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Per-endpoint filter / serialize / total timings plus cache counters."""
+    return jsonify({
+        "timings": timings.snapshot(),
+        "response_cache": {
+            "entries": len(response_cache),
+            "hits": response_cache.hits,
+            "misses": response_cache.misses,
+        },
+        "infer": {"batches": predictor.batcher.batches, "texts": predictor.batcher.items},
+        "dataset": {"records": len(dataset.current().store), "version": dataset.current().version},
+    })
+
+
+def _require_admin():
+    if not ADMIN_TOKEN:
+        abort(404)
+    if request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        abort(403)
+
+
+@app.route("/admin/reload", methods=["POST"])
+def reload_predictions():
+    """
+    Re-read JSONL_PATH in the background (only appended lines if the file
+    just grew). Returns 202 right away; poll /admin/status for the version.
+    While a reload is still running, nothing new is started ("already running").
+    """
+    _require_admin()
+    started = dataset.reload_in_background() is not None
+    return jsonify({
+        "version": dataset.current().version,
+        "reloading": True,
+        "status": "started" if started else "already running",
+    }), 202
+
 
-    return jsonify(results)
+@app.route("/admin/status", methods=["GET"])
+def dataset_status():
+    _require_admin()
+    snap = dataset.current()
+    return jsonify({
+        "path": JSONL_PATH,
+        "records": len(snap.store),
+        "version": snap.version,
+        "epoch": snap.epoch,
+    })
 
 
 @app.route("/", methods=["GET"])
@@ -111,5 +407,6 @@ def healthcheck():
 
 
 if __name__ == "__main__":
-    # Use `flask run` or just: python app.py
+    # Development server: `flask run` or just: python app.py
+    # For multi-worker serving use: python serve.py
     app.run(host="0.0.0.0", port=5005, debug=True)
\ No newline at end of file
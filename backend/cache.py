@@ -0,0 +1,54 @@
+# cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def make_etag(fingerprint, key):
+    """Strong ETag for the response to `key` against one version of the data."""
+    return hashlib.blake2b(repr((fingerprint, key)).encode(), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """
+    Bounded LRU of serialized response bodies keyed on normalized query
+    parameters. Entries belong to one dataset fingerprint; the first lookup
+    against a different fingerprint empties the cache.
+    """
+
+    def __init__(self, maxsize=256, max_body=4 << 20):
+        self.maxsize = maxsize
+        self.max_body = max_body
+        self.hits = self.misses = 0
+        self._fingerprint = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check(self, fingerprint):
+        if fingerprint != self._fingerprint:
+            self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def get(self, fingerprint, key):
+        with self._lock:
+            self._check(fingerprint)
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, fingerprint, key, body):
+        if len(body) > self.max_body:
+            return
+        with self._lock:
+            self._check(fingerprint)
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
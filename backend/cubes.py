@@ -0,0 +1,177 @@
+# cubes.py
+import numpy as np
+
+from store import Interner
+
+GROUP_DIMS = ("source", "stance", "entity")
+
+
+class BiasCubes:
+    """
+    Group-by counts precomputed from a PredictionStore, so bias summaries
+    never touch individual records at query time.
+
+      - count / score_sum             : [source, stance] -> sentences, sum of score
+      - label_count / label_score_sum : [source, stance, label] -> sentences
+        with at least one span of that label, sum of their scores
+      - mentions : one row per (entity text, source, stance) with the number
+        of spans and the sum of their sentences' scores
+
+    The last source / stance slot collects records without a value.
+    Scores follow the /predictions filter: a missing score counts as 0.0.
+    """
+
+    def __init__(self, store):
+        self.sources = list(store.sources) + [None]
+        self.stances = list(store.stances) + [None]
+        self.labels = list(store.labels)
+        n_src, n_st, n_lab = len(self.sources), len(self.stances), len(self.labels)
+
+        src = np.where(store.source_codes >= 0, store.source_codes, n_src - 1).astype(np.int64)
+        st = np.where(store.stance_codes >= 0, store.stance_codes, n_st - 1).astype(np.int64)
+        scores = store.filter_scores
+
+        cell = src * n_st + st
+        self.count = np.bincount(cell, minlength=n_src * n_st).reshape(n_src, n_st)
+        self.score_sum = np.bincount(cell, weights=scores, minlength=n_src * n_st).reshape(n_src, n_st)
+
+        owner = np.repeat(np.arange(len(store), dtype=np.int64), np.diff(store.span_offsets))
+        labelled = store.span_label >= 0
+        width = max(n_lab, 1)
+        pairs = np.unique(owner[labelled] * width + store.span_label[labelled])
+        rec, lab = pairs // width, pairs % width
+        lcell = cell[rec] * width + lab
+        size = n_src * n_st * width
+        self.label_count = np.bincount(lcell, minlength=size).reshape(n_src, n_st, width)
+        self.label_score_sum = np.bincount(
+            lcell, weights=scores[rec], minlength=size
+        ).reshape(n_src, n_st, width)
+
+        self._build_mentions(store, src, st, scores)
+
+    def _build_mentions(self, store, src, st, scores):
+        """Intern (label, surface text) for every well-formed span."""
+        self.entities = Interner()
+        codes, owners = [], []
+        for pos in np.flatnonzero(np.diff(store.span_offsets)):
+            text = store.text(pos)
+            lo, hi = store.span_offsets[pos], store.span_offsets[pos + 1]
+            for s, e, lab in zip(store.span_start[lo:hi], store.span_end[lo:hi], store.span_label[lo:hi]):
+                if lab < 0 or s < 0 or e <= s:
+                    continue
+                surface = text[s:e].strip()
+                if surface:
+                    codes.append(self.entities.code((self.labels[lab], surface)))
+                    owners.append(pos)
+
+        codes = np.array(codes, dtype=np.int64)
+        owners = np.array(owners, dtype=np.int64)
+        n_src, n_st = len(self.sources), len(self.stances)
+        key = (codes * n_src + src[owners]) * n_st + st[owners]
+        keys, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+        self.mention_entity = keys // (n_src * n_st)
+        self.mention_source = keys // n_st % n_src
+        self.mention_stance = keys % n_st
+        self.mention_count = counts
+        self.mention_score_sum = np.bincount(inverse, weights=scores[owners], minlength=len(keys))
+
+    # arrays that make up the cubes; everything else derives from the store
+    ARRAYS = (
+        "count", "score_sum", "label_count", "label_score_sum",
+        "mention_entity", "mention_source", "mention_stance",
+        "mention_count", "mention_score_sum",
+    )
+
+    def state(self):
+        state = {name: getattr(self, name) for name in self.ARRAYS}
+        state["entities"] = [list(entity) for entity in self.entities.values]
+        return state
+
+    @classmethod
+    def restore(cls, store, state):
+        """Rebuild cubes from `state()` output without rescanning the spans."""
+        cubes = cls.__new__(cls)
+        cubes.sources = list(store.sources) + [None]
+        cubes.stances = list(store.stances) + [None]
+        cubes.labels = list(store.labels)
+        for name in cls.ARRAYS:
+            setattr(cubes, name, state[name])
+        cubes.entities = Interner(tuple(entity) for entity in state["entities"])
+        return cubes
+
+    def groups(self, by, source=None, stance=None, label=None):
+        """
+        Counts and mean score grouped by any of GROUP_DIMS. "entity" groups by
+        span label and counts sentences mentioning at least one such entity.
+        """
+        use_labels = "entity" in by or label is not None
+        count = self.label_count if use_labels else self.count
+        score_sum = self.label_score_sum if use_labels else self.score_sum
+
+        selectors = [
+            _select(self.sources, source),
+            _select(self.stances, stance),
+        ]
+        names = [self.sources, self.stances]
+        if use_labels:
+            selectors.append(_select(self.labels, label))
+            names.append(self.labels)
+        count = count[np.ix_(*selectors)]
+        score_sum = score_sum[np.ix_(*selectors)]
+
+        axes = GROUP_DIMS[:len(selectors)]
+        drop = tuple(i for i, dim in enumerate(axes) if dim not in by)
+        count = count.sum(axis=drop)
+        score_sum = score_sum.sum(axis=drop)
+        kept = [(dim, [names[i][code] for code in selectors[i]]) for i, dim in enumerate(axes) if dim in by]
+
+        out = []
+        for cell in zip(*np.nonzero(count)) if count.ndim else [()]:
+            n = int(count[cell])
+            if not n:
+                continue
+            row = {dim: values[i] for (dim, values), i in zip(kept, cell)}
+            row["count"] = n
+            row["mean_score"] = float(score_sum[cell]) / n
+            out.append(row)
+        return out
+
+    def entity_stances(self, label=None, source=None, top=20):
+        """
+        Most mentioned entity texts with their stance distribution, mention
+        count and mean sentence score, optionally limited to one label/source.
+        """
+        labels = np.array([lab for lab, _ in self.entities.values], dtype=object)
+        mask = np.ones(len(self.mention_entity), dtype=bool)
+        if label is not None:
+            mask &= labels[self.mention_entity] == label
+        if source is not None:
+            mask &= np.isin(self.mention_source, _select(self.sources, source))
+
+        entity, rows = np.unique(self.mention_entity[mask], return_inverse=True)
+        per_stance = np.zeros((len(entity), len(self.stances)), dtype=np.int64)
+        np.add.at(per_stance, (rows, self.mention_stance[mask]), self.mention_count[mask])
+        totals = per_stance.sum(axis=1)
+        score_sum = np.bincount(rows, weights=self.mention_score_sum[mask], minlength=len(entity))
+
+        out = []
+        for row in np.argsort(-totals, kind="stable")[:top]:
+            lab, surface = self.entities.values[entity[row]]
+            out.append({
+                "text": surface,
+                "label": lab,
+                "count": int(totals[row]),
+                "mean_score": float(score_sum[row]) / int(totals[row]),
+                "stances": {
+                    str(self.stances[i]): int(c)
+                    for i, c in enumerate(per_stance[row]) if c
+                },
+            })
+        return out
+
+
+def _select(values, wanted):
+    """Codes along one cube axis: all of them, or just the one matching `wanted`."""
+    if wanted is None:
+        return np.arange(len(values))
+    return np.array([i for i, v in enumerate(values) if v == wanted and v is not None], dtype=np.int64)
@@ -0,0 +1,232 @@
+# dataset.py
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from cubes import BiasCubes
+from index import PredictionIndex
+from snapshot import load_snapshot, save_snapshot
+from store import StoreBuilder, file_digest, read_jsonl
+
+log = logging.getLogger("backend")
+
+# What a request works against. `version` changes on every reload; `epoch`
+# only when the file was rewritten rather than appended to, which is when
+# record positions (and therefore cursors) stop being comparable.
+# `fingerprint` is a digest of the parsed bytes, identical in every process
+# that loaded the same file.
+Snapshot = namedtuple("Snapshot", ["store", "index", "cubes", "version", "epoch", "fingerprint"])
+
+# File identity + how far we have parsed it.
+FileState = namedtuple("FileState", ["dev", "ino", "size", "mtime_ns", "consumed", "digest"])
+
+
+class Dataset:
+    """
+    Owns the current Snapshot of the predictions JSONL and swaps in new ones.
+
+    `reload` re-stats the file: if it only grew (same inode, same bytes up to
+    what was already parsed) only the appended lines are parsed and added to
+    the existing store; otherwise the file is parsed from scratch. Indexes
+    and aggregation cubes are rebuilt on the calling thread (the watcher or a
+    background thread), and the new Snapshot is published with a single
+    assignment, so a request that already called `current()` keeps a
+    consistent view until it finishes.
+
+    With `snapshot_dir` (see snapshot.py) the first Snapshot is mapped from
+    disk instead of parsed; if the JSONL changed since the snapshot was
+    compiled, the usual append / full-parse logic brings it up to date.
+
+    After `share_reloads()` (serve.py, forked workers) reloads go through the
+    snapshot directory instead: whichever process holds the snapshot lock
+    re-checks the JSONL and, if it changed, rebuilds once and republishes
+    the snapshot; every process maps the newest published snapshot. So all
+    workers serve the same version (same fingerprint, epoch and version
+    number) and share its pages instead of each parsing a private copy.
+    """
+
+    def __init__(self, path, snapshot_dir=None):
+        self.path = path
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._reloader = None
+        self._reloader_lock = threading.Lock()
+        self._snapshot = None
+        self._file = None
+        self._shared = False
+        self._mapped = None         # (inode, mtime_ns) of the manifest last mapped
+        self._mapped_fingerprint = None
+        if snapshot_dir and os.path.exists(os.path.join(snapshot_dir, "manifest.json")):
+            self._load_snapshot(snapshot_dir)
+        self.reload()
+
+    def _load_snapshot(self, snapshot_dir):
+        try:
+            mst = os.stat(os.path.join(snapshot_dir, "manifest.json"))
+            store, index, cubes, source = load_snapshot(snapshot_dir)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("ignoring snapshot %s: %s", snapshot_dir, e)
+            return
+        st = os.stat(self.path)
+        self._snapshot = Snapshot(
+            store, index, cubes,
+            version=source.get("version", 0),
+            epoch=source.get("epoch", 0),
+            fingerprint=source["digest"],
+        )
+        self._mapped = (mst.st_ino, mst.st_mtime_ns)
+        self._mapped_fingerprint = source["digest"]
+        # same identity as the file on disk; reload() then only has to compare
+        # size / mtime, and falls back to the digest check if they moved
+        self._file = FileState(
+            st.st_dev, st.st_ino, source["size"], source["mtime_ns"],
+            source["consumed"], source["digest"],
+        )
+        log.info("mapped snapshot %s: %d records", snapshot_dir, len(store))
+
+    def current(self):
+        return self._snapshot
+
+    def reload(self):
+        """Bring the snapshot up to date with the file. Returns True if it changed."""
+        with self._lock:
+            st = os.stat(self.path)
+            old, snap = self._file, self._snapshot
+            if old and (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns) == old[:4]:
+                return False
+
+            appended = (
+                old is not None
+                and (st.st_dev, st.st_ino) == (old.dev, old.ino)
+                and st.st_size >= old.consumed
+                and file_digest(self.path, old.consumed) == old.digest
+            )
+            if appended:
+                builder = StoreBuilder(base=snap.store)
+                consumed = read_jsonl(self.path, builder, start=old.consumed)
+                if consumed == old.consumed:
+                    self._file = old._replace(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                    return False
+                epoch = snap.epoch
+            else:
+                builder = StoreBuilder()
+                consumed = read_jsonl(self.path, builder)
+                epoch = snap.epoch + 1 if snap else 0
+
+            store = builder.build()
+            digest = file_digest(self.path, consumed)
+            self._snapshot = Snapshot(
+                store=store,
+                index=PredictionIndex(store),
+                cubes=BiasCubes(store),
+                version=snap.version + 1 if snap else 0,
+                epoch=epoch,
+                fingerprint=digest,
+            )
+            self._file = FileState(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, consumed, digest)
+            log.info("loaded %s: %d records (version %d, %s)", self.path, len(store),
+                     self._snapshot.version, "appended" if appended else "full parse")
+            return True
+
+    def share_reloads(self):
+        """
+        Switch to reloading through `snapshot_dir`. Called in the gunicorn
+        master before the workers fork; publishes the current data first if
+        the snapshot on disk is missing or older than the JSONL.
+        """
+        if not self.snapshot_dir:
+            raise ValueError("share_reloads needs a snapshot_dir")
+        self._shared = True
+        self.sync()
+
+    @contextmanager
+    def _snapshot_lock(self):
+        import fcntl     # POSIX only, like gunicorn itself
+
+        with open(self.snapshot_dir + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _follow(self):
+        """Map the published snapshot if it is not the one already mapped."""
+        try:
+            st = os.stat(os.path.join(self.snapshot_dir, "manifest.json"))
+        except FileNotFoundError:
+            return
+        if (st.st_ino, st.st_mtime_ns) != self._mapped:
+            with self._lock:
+                self._load_snapshot(self.snapshot_dir)
+
+    def _publish(self):
+        snap, f = self._snapshot, self._file
+        save_snapshot(self.snapshot_dir, snap.store, snap.index, snap.cubes, {
+            "path": os.path.abspath(self.path),
+            "size": f.size,
+            "mtime_ns": f.mtime_ns,
+            "consumed": f.consumed,
+            "digest": f.digest,
+            "version": snap.version,
+            "epoch": snap.epoch,
+        })
+        log.info("published %s (version %d)", self.snapshot_dir, snap.version)
+        # serve the mapped copy too, so this process holds no private one
+        with self._lock:
+            self._load_snapshot(self.snapshot_dir)
+
+    def sync(self):
+        """
+        Shared mode: holding the snapshot lock, map the published snapshot,
+        then reload the JSONL and republish if it changed.
+        Otherwise the same as `reload`.
+        """
+        if not self._shared:
+            return self.reload()
+        before = self._snapshot.fingerprint if self._snapshot else None
+        # under the lock, so a snapshot is never mapped while it is being swapped
+        with self._snapshot_lock():
+            self._follow()
+            self.reload()
+            if self._snapshot.fingerprint != self._mapped_fingerprint:
+                self._publish()
+        return self._snapshot.fingerprint != before
+
+    def reload_in_background(self):
+        """
+        Run `sync` off the calling (request) thread. Returns None without
+        starting anything if a reload started here is still running.
+        """
+        with self._reloader_lock:
+            if self._reloader is not None and self._reloader.is_alive():
+                return None
+            self._reloader = threading.Thread(target=self.sync, name="predictions-reload", daemon=True)
+            self._reloader.start()
+            return self._reloader
+
+    def watch(self, interval):
+        """
+        Poll the file every `interval` seconds and reload when it changes.
+        Safe to call repeatedly: threads do not survive fork(), so a forked
+        worker gets its own watcher the first time it calls this. In shared
+        mode the watchers only map what one of them published (see `sync`).
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sync()
+                except (OSError, ValueError) as e:
+                    # keep serving the last good snapshot; retry next tick
+                    log.warning("reloading %s failed: %s", self.path, e)
+
+        self._watcher = threading.Thread(target=loop, name="predictions-watch", daemon=True)
+        self._watcher.start()
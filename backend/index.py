@@ -0,0 +1,235 @@
+# index.py
+from functools import lru_cache
+
+import numpy as np
+
+from store import IRREGULAR
+
+# How many distinct filter combinations keep their full match list around,
+# so paging through one result set does not re-run the intersection.
+MATCH_CACHE_SIZE = 256
+
+# Maps the entity filter values used by the frontend onto the span labels
+# written by the bootstrap scripts.
+ENTITY_NORMALIZER = {
+    "PER":   "PERSON",
+    "LOC":   "LOC",
+    "ORG":   "ORG",
+    "EVENT": "EVENT",
+}
+
+
+def _source_keys(store):
+    """metadata.source, case-insensitive; missing sources sort as ""."""
+    names = [v.lower() if isinstance(v, str) else "" for v in store.sources] + [""]
+    codes = np.where(store.source_codes >= 0, store.source_codes, len(store.sources))
+    return _dense_ranks(names)[codes]
+
+
+def _date_keys(store):
+    """YYYY/MM/DD ascending, records without a date last."""
+    dates = store.dates
+    if (dates == IRREGULAR).any():
+        keys = [(d is None, d or "") for d in map(store.date, range(len(store)))]
+        return _dense_ranks(keys)
+    return np.where(dates >= 0, dates, np.iinfo(np.int32).max).astype(np.int64)
+
+
+def _score_keys(store):
+    return store.filter_scores
+
+
+# Sort orders precomputed at load time; "-<key>" gives the descending order.
+# Ties always keep file order.
+SORT_KEYS = {
+    "source": _source_keys,
+    "date":   _date_keys,
+    "score":  _score_keys,
+}
+
+
+def intersect(postings):
+    """
+    Intersect sorted posting arrays, smallest first.
+    Each remaining array is probed with searchsorted, so the cost is driven by
+    the most selective filter rather than by the corpus size.
+    """
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for other in postings[1:]:
+        if not len(result) or not len(other):
+            return result[:0]
+        idx = np.minimum(np.searchsorted(other, result), len(other) - 1)
+        result = result[other[idx] == result]
+    return result
+
+
+class PredictionIndex:
+    """
+    Inverted indexes over a PredictionStore.
+
+    Every posting array holds record positions in file order, so intersecting
+    them keeps the order `get_predictions` has always returned.
+      - by_source : metadata.source -> positions
+      - by_stance : stance          -> positions
+      - by_label  : span label      -> positions with at least one such span
+      - scores / score_order : per-record score (missing = 0.0) and the
+        positions sorted by score, for `min_score` range lookups
+      - ranks     : sort name -> rank of every position in that presorted
+        order, so a match list can be reordered without comparing records
+    """
+
+    def __init__(self, store):
+        self.store = store
+        n = len(store)
+
+        self.by_source = _postings(store.source_codes, store.sources)
+        self.by_stance = _postings(store.stance_codes, store.stances)
+
+        span_owner = np.repeat(np.arange(n, dtype=np.int64), np.diff(store.span_offsets))
+        labelled = store.span_label >= 0
+        width = max(n, 1)
+        pairs = np.unique(store.span_label[labelled].astype(np.int64) * width + span_owner[labelled])
+        self.by_label = {
+            store.labels[code]: positions
+            for code, positions in _split(pairs // width, pairs % width, len(store.labels))
+        }
+
+        self.scores = store.filter_scores
+        self.score_order = np.argsort(self.scores, kind="stable")
+        self.sorted_scores = self.scores[self.score_order]
+
+        self.ranks = {}
+        for name, key in SORT_KEYS.items():
+            keys = key(store)
+            self.ranks[name] = _ranks(np.argsort(keys, kind="stable"))
+            self.ranks["-" + name] = _ranks(np.argsort(-keys, kind="stable"))
+
+        self._init_caches()
+
+    def _init_caches(self):
+        self._cached_match = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match)
+        self._cached_order = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._order)
+
+    def state(self):
+        """Everything `restore` needs, as arrays and value -> array dicts."""
+        return {
+            "by_source": self.by_source,
+            "by_stance": self.by_stance,
+            "by_label": self.by_label,
+            "score_order": self.score_order,
+            "sorted_scores": self.sorted_scores,
+            "ranks": self.ranks,
+        }
+
+    @classmethod
+    def restore(cls, store, state):
+        """Rebuild an index from `state()` output without recomputing it."""
+        index = cls.__new__(cls)
+        index.store = store
+        index.scores = store.filter_scores
+        index.__dict__.update(state)
+        index._init_caches()
+        return index
+
+    def __len__(self):
+        return len(self.store)
+
+    def at_least(self, min_score):
+        """Positions (file order) whose score is >= min_score."""
+        lo = np.searchsorted(self.sorted_scores, min_score, side="left")
+        if lo == 0:
+            return np.arange(len(self.store), dtype=np.int64)
+        return np.sort(self.score_order[lo:])
+
+    def match(self, source=None, stance=None, entity=None, min_score=0.0):
+        """
+        Positions of all records passing the filters, in file order.
+        `entity` is the already-normalized span label (e.g. "PERSON").
+        The result is memoized per filter combination.
+        """
+        return self._cached_match(source or None, stance or None, entity or None, min_score)
+
+    def page(self, after=None, limit=100, sort=None, **filters):
+        """
+        One page of matches that come after position `after` (the last row
+        already served) in the `sort` order; without `sort`, file order.
+        Positions stay valid when records are appended, so cursors built on
+        them survive a reload.
+        Returns (positions, total, position of the last row or None if exhausted).
+        """
+        positions, keys = self._cached_order(
+            sort or None,
+            filters.get("source") or None,
+            filters.get("stance") or None,
+            filters.get("entity") or None,
+            filters.get("min_score", 0.0),
+        )
+        start = 0
+        if after is not None:
+            key = after if sort is None else self.ranks[sort][after]
+            start = int(np.searchsorted(keys, key, side="right"))
+        end = start + limit
+        more = end < len(positions)
+        return positions[start:end], len(positions), int(positions[end - 1]) if more else None
+
+    def _order(self, sort, *filters):
+        matches = self._cached_match(*filters)
+        if sort is None:
+            return matches, matches
+        keys = self.ranks[sort][matches]
+        order = np.argsort(keys, kind="stable")
+        return matches[order], keys[order]
+
+    def _match(self, source, stance, entity, min_score):
+        empty = np.empty(0, dtype=np.int64)
+        postings = []
+        if source:
+            postings.append(self.by_source.get(source, empty))
+        if stance:
+            postings.append(self.by_stance.get(stance, empty))
+        if entity:
+            postings.append(self.by_label.get(entity, empty))
+
+        if not postings:
+            candidates = np.arange(len(self.store), dtype=np.int64)
+            if len(candidates) and min_score > self.sorted_scores[0]:
+                candidates = self.at_least(min_score)
+            return candidates
+
+        candidates = intersect(postings)
+        if len(candidates) and min_score > self.sorted_scores[0]:
+            candidates = candidates[self.scores[candidates] >= min_score]
+        return candidates
+
+
+def _postings(codes, values):
+    """value -> sorted positions holding that value's code."""
+    present = codes >= 0
+    return dict(
+        (values[code], group)
+        for code, group in _split(codes[present], np.flatnonzero(present), len(values))
+    )
+
+
+def _split(codes, positions, size):
+    """Group `positions` by `codes` (0..size-1), keeping each group sorted."""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=size), out=bounds[1:])
+    grouped = positions[order].astype(np.int64)
+    for code in range(size):
+        if bounds[code + 1] > bounds[code]:
+            yield code, grouped[bounds[code]:bounds[code + 1]]
+
+
+def _dense_ranks(keys):
+    """Rank of each key among the distinct keys, so equal keys tie."""
+    distinct = {key: r for r, key in enumerate(sorted(set(keys)))}
+    return np.array([distinct[key] for key in keys], dtype=np.int64)
+
+
+def _ranks(order):
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank
@@ -0,0 +1,159 @@
+# inference.py
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout, wait
+
+log = logging.getLogger("backend")
+
+# onnx_backend.py and pipeline_outputs.py live at the repo root, one level
+# above backend/ (appended, so backend's own modules still come first)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+from pipeline_outputs import to_prediction
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into batched calls of `fn`.
+
+    `submit` queues one item and returns a Future. A worker thread waits for
+    the first item, then keeps collecting until `max_batch_size` items are
+    queued or `max_wait_ms` has passed since that first item, and calls
+    `fn(items)` once for the whole batch. `fn` must return one result per item.
+    """
+
+    def __init__(self, fn, max_batch_size=32, max_wait_ms=10, name="micro-batcher"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.batches = self.items = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # started on first use so that forked gunicorn workers get their own
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def submit(self, item):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # items whose caller gave up (cancelled futures) are dropped here;
+            # the rest can no longer be cancelled
+            batch = [(item, future) for item, future in self._collect()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = self.fn(items)
+            except Exception as e:      # hand the failure to every caller
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class LivePredictor:
+    """
+    NER + stance for free text, in the same shape as the records of the
+    predictions JSONL ({"text", "spans", "stance", "score"}).
+    The fine-tuned models are loaded once, on first use, as transformers
+    pipelines (backend "torch") or as their ONNX Runtime exports ("onnx").
+    """
+
+    def __init__(self, ner_model_dir, stance_model_dir, max_batch_size=32, max_wait_ms=10,
+                 backend="torch"):
+        self.ner_model_dir = ner_model_dir
+        self.stance_model_dir = stance_model_dir
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self._ner_pipe = self._stance_pipe = None
+        self._load_lock = threading.Lock()
+        self.batcher = MicroBatcher(
+            self._predict_batch, max_batch_size, max_wait_ms, name="infer-batcher"
+        )
+
+    def _load(self):
+        with self._load_lock:
+            if self._ner_pipe is not None:
+                return
+            log.info("loading %s and %s (%s)", self.ner_model_dir, self.stance_model_dir, self.backend)
+            if self.backend == "onnx":
+                from onnx_backend import load_pipeline
+
+                self._ner_pipe = load_pipeline(
+                    "ner", self.ner_model_dir, backend="onnx", aggregation_strategy="simple"
+                )
+                self._stance_pipe = load_pipeline(
+                    "text-classification", self.stance_model_dir, backend="onnx"
+                )
+                return
+            from transformers import pipeline
+
+            self._ner_pipe = pipeline(
+                "ner",
+                model=self.ner_model_dir,
+                tokenizer=self.ner_model_dir,
+                aggregation_strategy="simple",
+            )
+            self._stance_pipe = pipeline(
+                "text-classification",
+                model=self.stance_model_dir,
+                tokenizer=self.stance_model_dir,
+            )
+
+    def _predict_batch(self, texts):
+        self._load()
+        entities = self._ner_pipe(texts, batch_size=self.max_batch_size)
+        stances = self._stance_pipe(texts, batch_size=self.max_batch_size, truncation=True)
+        return [
+            {"text": text, **to_prediction(ents, stance)}
+            for text, ents, stance in zip(texts, entities, stances)
+        ]
+
+    def predict(self, texts, timeout=None):
+        """
+        Queue each text separately so they batch with other requests.
+        `timeout` covers the whole call: if any text is still pending by then,
+        the texts not yet picked up by the batcher are cancelled and
+        concurrent.futures.TimeoutError is raised.
+        """
+        futures = [self.batcher.submit(text) for text in texts]
+        _, pending = wait(futures, timeout=timeout)
+        if pending:
+            for future in pending:
+                future.cancel()
+            raise FutureTimeout(f"{len(pending)} of {len(texts)} texts still pending")
+        return [future.result() for future in futures]
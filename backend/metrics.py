@@ -0,0 +1,103 @@
+# metrics.py
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import orjson
+from flask import g, request
+
+log = logging.getLogger("backend")
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open.
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class PhaseTimings:
+    """Running count / sum / max / histogram of milliseconds per (endpoint, phase)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def observe(self, endpoint, phase, ms):
+        with self._lock:
+            stat = self._stats.get((endpoint, phase))
+            if stat is None:
+                stat = self._stats[(endpoint, phase)] = {
+                    "count": 0, "sum_ms": 0.0, "max_ms": 0.0,
+                    "buckets": [0] * (len(BUCKETS_MS) + 1),
+                }
+            stat["count"] += 1
+            stat["sum_ms"] += ms
+            stat["max_ms"] = max(stat["max_ms"], ms)
+            bucket = next((i for i, le in enumerate(BUCKETS_MS) if ms <= le), len(BUCKETS_MS))
+            stat["buckets"][bucket] += 1
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for (endpoint, phase), stat in self._stats.items():
+                out.setdefault(endpoint, {})[phase] = {
+                    "count": stat["count"],
+                    "mean_ms": stat["sum_ms"] / stat["count"],
+                    "max_ms": stat["max_ms"],
+                    "buckets_ms": dict(zip([str(le) for le in BUCKETS_MS] + ["inf"], stat["buckets"])),
+                }
+            return out
+
+
+timings = PhaseTimings()
+
+
+@contextmanager
+def timed(phase):
+    """Add the wall time of the block to this request's `phase` timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.timings[phase] = g.timings.get(phase, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def configure_logging():
+    """
+    PREDICTIONS_LOG_LEVEL=DEBUG adds per-request detail (filters, match
+    counts); at the default INFO those calls are skipped before any string
+    is built, and at WARNING the per-request lines are skipped too.
+    """
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    log.setLevel(os.environ.get("PREDICTIONS_LOG_LEVEL", "INFO").upper())
+
+
+def init_app(app):
+    """Time every request and log one structured line per request at INFO."""
+
+    @app.before_request
+    def start_timer():
+        g.start = time.perf_counter()
+        g.timings = {}
+        g.cache = None
+
+    @app.after_request
+    def record_timings(resp):
+        if "start" not in g:
+            return resp
+        g.timings["total"] = (time.perf_counter() - g.start) * 1000
+        endpoint = request.endpoint or "unknown"
+        for phase, ms in g.timings.items():
+            timings.observe(endpoint, phase, ms)
+        resp.headers["Server-Timing"] = ", ".join(
+            f"{phase};dur={ms:.2f}" for phase, ms in g.timings.items()
+        )
+        if log.isEnabledFor(logging.INFO):
+            log.info(orjson.dumps({
+                "method": request.method,
+                "path": request.path,
+                "query": request.query_string.decode("latin-1"),
+                "status": resp.status_code,
+                "cache": g.cache,
+                "ms": {phase: round(ms, 3) for phase, ms in g.timings.items()},
+            }).decode())
+        return resp
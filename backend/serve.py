@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# serve.py
+"""
+Production entry point for the backend.
+
+    python serve.py                    # gunicorn, one worker per core
+    python serve.py --workers 8 --threads 4 --bind 0.0.0.0:5005
+    python serve.py --server waitress  # single process, threaded (Windows)
+
+With gunicorn the app (and so the whole prediction store) is imported once in
+the master and the workers are forked from it (preload_app). The columnar
+store keeps its data in a handful of large numpy buffers, which stay shared
+copy-on-write between all workers; gc.freeze() keeps the collector from
+touching the remaining Python objects and un-sharing their pages. Memory
+therefore stays close to one copy of the data however many workers run.
+
+Reloads go through the snapshot directory (Dataset.share_reloads): when the
+JSONL changes, the one worker that takes the snapshot lock first rebuilds
+and republishes the snapshot, and every worker maps the new one. The data
+then stays a single shared copy, and all workers serve the same version
+(same ETags and cursors). POST /admin/reload on any worker does the same.
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+
+
+def run_gunicorn(app, args, post_fork=None):
+    from gunicorn.app.base import BaseApplication
+
+    class PreloadedApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    PreloadedApplication(app, {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread" if args.threads > 1 else "sync",
+        "preload_app": True,
+        "timeout": args.timeout,
+        "accesslog": None,   # the app logs one structured line per request
+        "post_fork": post_fork or (lambda server, worker: None),
+    }).run()
+
+
+def run_waitress(app, args):
+    from waitress import serve
+
+    host, _, port = args.bind.rpartition(":")
+    serve(app, host=host or "0.0.0.0", port=int(port), threads=args.threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the predictions backend.")
+    parser.add_argument("--bind", default="0.0.0.0:5005")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--timeout", type=int, default=60)
+    parser.add_argument(
+        "--server",
+        choices=["gunicorn", "waitress"],
+        default="waitress" if os.name == "nt" else "gunicorn",
+    )
+    args = parser.parse_args()
+
+    # loads JSONL_PATH once, before any worker exists
+    from app import RELOAD_INTERVAL, app, dataset
+
+    if args.server == "waitress":
+        run_waitress(app, args)
+        return
+
+    # publish the snapshot the workers will map, if it is missing or stale
+    dataset.share_reloads()
+
+    def post_fork(server, worker):
+        # every worker follows the shared snapshot from the start
+        if RELOAD_INTERVAL > 0:
+            dataset.watch(RELOAD_INTERVAL)
+
+    gc.collect()
+    gc.freeze()
+    run_gunicorn(app, args, post_fork)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# snapshot.py
+"""
+Compile the predictions JSONL into a binary snapshot the backend can mmap.
+
+    python snapshot.py                                  # ../bootstrapped_labels_2.0.jsonl
+    python snapshot.py path/to/preds.jsonl [--out DIR]  # default DIR: <jsonl>.snapshot
+
+The snapshot is a directory of .npy files (store columns, index postings and
+ranks, aggregation cubes) plus manifest.json with the interned values and the
+size / mtime / digest of the JSONL it was built from. Loading it maps the
+arrays read-only instead of parsing JSON, so startup no longer grows with the
+corpus, and gunicorn workers share the mapped pages through the page cache.
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+from cubes import BiasCubes
+from index import PredictionIndex
+from store import COLUMNS, VOCABULARIES, PredictionStore, StoreBuilder, file_digest, read_jsonl
+
+FORMAT_VERSION = 1
+DEFAULT_JSONL = "../bootstrapped_labels_2.0.jsonl"
+
+
+def snapshot_dir_for(jsonl_path):
+    return jsonl_path + ".snapshot"
+
+
+def _save_state(out_dir, prefix, state):
+    """Arrays go to .npy files, value -> array dicts are concatenated, the rest is JSON."""
+    meta = {"arrays": [], "dicts": {}, "json": {}}
+    for name, value in state.items():
+        if isinstance(value, np.ndarray):
+            np.save(os.path.join(out_dir, f"{prefix}.{name}.npy"), value)
+            meta["arrays"].append(name)
+        elif isinstance(value, dict):
+            keys = list(value)
+            arrays = [np.asarray(value[k]) for k in keys]
+            offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+            np.cumsum([len(a) for a in arrays], out=offsets[1:])
+            values = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+            np.save(os.path.join(out_dir, f"{prefix}.{name}.values.npy"), values)
+            np.save(os.path.join(out_dir, f"{prefix}.{name}.offsets.npy"), offsets)
+            meta["dicts"][name] = keys
+        else:
+            meta["json"][name] = value
+    return meta
+
+
+def _load_array(path):
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:          # zero-length arrays cannot be mapped
+        return np.load(path)
+
+
+def _load_state(snapshot_dir, prefix, meta):
+    state = {}
+    for name in meta["arrays"]:
+        state[name] = _load_array(os.path.join(snapshot_dir, f"{prefix}.{name}.npy"))
+    for name, keys in meta["dicts"].items():
+        values = _load_array(os.path.join(snapshot_dir, f"{prefix}.{name}.values.npy"))
+        offsets = np.load(os.path.join(snapshot_dir, f"{prefix}.{name}.offsets.npy"))
+        state[name] = {key: values[offsets[i]:offsets[i + 1]] for i, key in enumerate(keys)}
+    state.update(meta["json"])
+    return state
+
+
+def write_snapshot(jsonl_path, out_dir=None):
+    """Parse `jsonl_path`, build every index, and write the snapshot directory."""
+    st = os.stat(jsonl_path)
+    builder = StoreBuilder()
+    consumed = read_jsonl(jsonl_path, builder)
+    store = builder.build()
+    source = {
+        "path": os.path.abspath(jsonl_path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "consumed": consumed,
+        "digest": file_digest(jsonl_path, consumed),
+    }
+    return save_snapshot(out_dir or snapshot_dir_for(jsonl_path), store,
+                         PredictionIndex(store), BiasCubes(store), source)
+
+
+def save_snapshot(out_dir, store, index, cubes, source):
+    """
+    Write an already built store / index / cubes to `out_dir`. `source`
+    describes the JSONL they came from (path, size, mtime_ns, consumed,
+    digest) and may carry the backend's `version` / `epoch` for it.
+    """
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = {name: getattr(store, name) for name in COLUMNS + ("filter_scores",)}
+    manifest = {
+        "format": FORMAT_VERSION,
+        "records": len(store),
+        "source": source,
+        "vocabularies": {name: getattr(store, name) for name in VOCABULARIES},
+        "store": _save_state(tmp_dir, "store", columns),
+        "index": _save_state(tmp_dir, "index", index.state()),
+        "cubes": _save_state(tmp_dir, "cubes", cubes.state()),
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    # swap directories so a reader never sees a half-written snapshot
+    old_dir = out_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def load_snapshot(snapshot_dir):
+    """
+    Map a snapshot written by `write_snapshot`.
+    Returns (store, index, cubes, source) where `source` describes the JSONL
+    the snapshot was built from; raises ValueError for an unknown format.
+    """
+    with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot format {manifest.get('format')}")
+
+    store = PredictionStore(
+        **manifest["vocabularies"],
+        **_load_state(snapshot_dir, "store", manifest["store"]),
+    )
+    index = PredictionIndex.restore(store, _load_state(snapshot_dir, "index", manifest["index"]))
+    cubes = BiasCubes.restore(store, _load_state(snapshot_dir, "cubes", manifest["cubes"]))
+    return store, index, cubes, manifest["source"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile predictions JSONL into an mmap-able snapshot.")
+    parser.add_argument("jsonl", nargs="?", default=DEFAULT_JSONL)
+    parser.add_argument("--out", default=None, help="snapshot directory (default: <jsonl>.snapshot)")
+    args = parser.parse_args()
+
+    manifest = write_snapshot(args.jsonl, args.out)
+    print(f"Wrote {manifest['records']} records to {args.out or snapshot_dir_for(args.jsonl)}")
+
+
+if __name__ == "__main__":
+    main()
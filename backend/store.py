@@ -0,0 +1,345 @@
+# store.py
+import hashlib
+import json
+import re
+
+import numpy as np
+import orjson
+
+DATE_PATTERN = re.compile(r"^(\d{4})/(\d{2})/(\d{2})$")
+META_KEYS = ("source", "filename", "date", "sentence_index")
+SPAN_KEYS = {"start", "end", "label"}
+RECORD_KEYS = {"text", "metadata", "stance", "score", "spans"}
+
+# Sentinels used by the integer columns.
+ABSENT, NULL, IRREGULAR = -1, -2, -3
+
+
+class Interner:
+    """Maps repeated values (sources, filenames, labels...) to small int codes."""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {v: i for i, v in enumerate(self.values)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value):
+        try:
+            code = self.codes.get(value)
+        except TypeError:          # unhashable (list / dict) value
+            return IRREGULAR
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class StoreBuilder:
+    """
+    Accumulates records one at a time and packs them into a PredictionStore.
+
+    Values that do not fit a column's encoding (an unparseable date, extra
+    metadata keys, unknown top-level keys...) are kept verbatim in a per-record
+    overflow blob, so `PredictionStore.record` always gives back the original.
+
+    With `base`, the built store is `base` followed by the added records; the
+    interned values are carried over so existing codes stay valid.
+    """
+
+    def __init__(self, base=None):
+        self.base = base
+        self.sources = Interner(base.sources if base else ())
+        self.filenames = Interner(base.filenames if base else ())
+        self.stances = Interner(base.stances if base else ())
+        self.labels = Interner(base.labels if base else ())
+
+        self.text = []
+        self.source_codes, self.filename_codes = [], []
+        self.dates, self.sentence_index = [], []
+        self.stance_codes, self.scores = [], []
+        self.has_spans, self.span_counts = [], []
+        self.span_start, self.span_end, self.span_label = [], [], []
+        self.extras = []
+
+    def add(self, rec):
+        extra, meta_extra = {}, {}
+        meta = rec["metadata"]
+
+        text = rec["text"]
+        if isinstance(text, str):
+            self.text.append(text.encode("utf8"))
+        else:
+            self.text.append(b"")
+            extra["text"] = text
+
+        self.source_codes.append(_intern(self.sources, meta, "source", meta_extra))
+        self.filename_codes.append(_intern(self.filenames, meta, "filename", meta_extra))
+        self.dates.append(_encode_date(meta, meta_extra))
+        self.sentence_index.append(_encode_index(meta, meta_extra))
+        for key, value in meta.items():
+            if key not in META_KEYS:
+                meta_extra[key] = value
+
+        self.stance_codes.append(_intern(self.stances, rec, "stance", extra))
+
+        score = rec.get("score")
+        if "score" not in rec:
+            self.scores.append(np.nan)
+        elif isinstance(score, (int, float)) and not isinstance(score, bool):
+            self.scores.append(score)
+            if not isinstance(score, float):
+                extra["score"] = score      # keep ints as ints on the way out
+        else:
+            self.scores.append(np.nan)
+            extra["score"] = score
+
+        self._add_spans(rec, extra)
+
+        for key, value in rec.items():
+            if key not in RECORD_KEYS:
+                extra[key] = value
+        if meta_extra:
+            extra["metadata"] = meta_extra
+        self.extras.append(orjson.dumps(extra) if extra else b"")
+
+    def _add_spans(self, rec, extra):
+        self.has_spans.append("spans" in rec)
+        spans = rec.get("spans")
+        if not isinstance(spans, list):
+            self.span_counts.append(0)
+            if spans is not None or "spans" in rec:
+                extra["spans"] = spans
+            return
+
+        regular = True
+        count = 0
+        for span in spans:
+            if not isinstance(span, dict):
+                regular = False
+                continue
+            start, end = span.get("start"), span.get("end")
+            label = self.labels.code(span.get("label"))
+            regular &= (
+                span.keys() == SPAN_KEYS
+                and _is_int(start) and _is_int(end)
+                and isinstance(span["label"], str)
+            )
+            self.span_start.append(start if _is_int(start) else -1)
+            self.span_end.append(end if _is_int(end) else -1)
+            self.span_label.append(label if label >= 0 else ABSENT)
+            count += 1
+        self.span_counts.append(count)
+        if not regular:
+            extra["spans"] = spans
+
+    def build(self):
+        text_offsets = np.zeros(len(self.text) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in self.text], out=text_offsets[1:])
+        span_offsets = np.zeros(len(self.span_counts) + 1, dtype=np.int64)
+        np.cumsum(self.span_counts, out=span_offsets[1:])
+        extra_offsets = np.zeros(len(self.extras) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in self.extras], out=extra_offsets[1:])
+
+        columns = dict(
+            text_blob=np.frombuffer(b"".join(self.text), dtype=np.uint8),
+            text_offsets=text_offsets,
+            source_codes=np.array(self.source_codes, dtype=np.int32),
+            filename_codes=np.array(self.filename_codes, dtype=np.int32),
+            dates=np.array(self.dates, dtype=np.int32),
+            sentence_index=np.array(self.sentence_index, dtype=np.int32),
+            stance_codes=np.array(self.stance_codes, dtype=np.int16),
+            scores=np.array(self.scores, dtype=np.float64),
+            has_spans=np.array(self.has_spans, dtype=bool),
+            span_offsets=span_offsets,
+            span_start=np.array(self.span_start, dtype=np.int32),
+            span_end=np.array(self.span_end, dtype=np.int32),
+            span_label=np.array(self.span_label, dtype=np.int16),
+            extra_blob=np.frombuffer(b"".join(self.extras), dtype=np.uint8),
+            extra_offsets=extra_offsets,
+        )
+        if self.base is not None:
+            for name, column in columns.items():
+                old = getattr(self.base, name)
+                if name.endswith("_offsets"):
+                    column = column[1:] + old[-1]
+                columns[name] = np.concatenate([old, column])
+
+        return PredictionStore(
+            sources=self.sources.values,
+            filenames=self.filenames.values,
+            stances=self.stances.values,
+            labels=self.labels.values,
+            **columns,
+        )
+
+
+# every numpy column of a PredictionStore, in the order StoreBuilder fills them
+COLUMNS = (
+    "text_blob", "text_offsets", "source_codes", "filename_codes", "dates",
+    "sentence_index", "stance_codes", "scores", "has_spans", "span_offsets",
+    "span_start", "span_end", "span_label", "extra_blob", "extra_offsets",
+)
+VOCABULARIES = ("sources", "filenames", "stances", "labels")
+
+
+class PredictionStore:
+    """
+    Column-oriented copy of the predictions JSONL.
+
+      - sources / filenames / stances / labels : interned values; the *_codes
+        columns index into them (ABSENT when the key is missing)
+      - dates          : int32 YYYYMMDD (ABSENT / NULL / IRREGULAR sentinels)
+      - sentence_index : int32
+      - scores         : float64, NaN when the record has no usable score
+      - text_blob + text_offsets   : UTF-8 sentence text, one slice per record
+      - span_offsets   : record i owns spans span_offsets[i]:span_offsets[i+1]
+        of span_start / span_end / span_label
+      - extra_blob + extra_offsets : JSON overflow for anything the columns
+        cannot represent exactly
+    Records are only rebuilt as dicts by `record` / `records`.
+    """
+
+    def __init__(self, **columns):
+        for name, value in columns.items():
+            setattr(self, name, value)
+        # what the score filter compares against: a missing score counts as 0.0
+        if "filter_scores" not in columns:
+            self.filter_scores = np.where(np.isnan(self.scores), 0.0, self.scores)
+
+    def __len__(self):
+        return len(self.text_offsets) - 1
+
+    def text(self, pos):
+        return self.text_blob[self.text_offsets[pos]:self.text_offsets[pos + 1]].tobytes().decode("utf8")
+
+    def extra(self, pos):
+        raw = self.extra_blob[self.extra_offsets[pos]:self.extra_offsets[pos + 1]]
+        return orjson.loads(raw.tobytes()) if len(raw) else {}
+
+    def date(self, pos):
+        value = int(self.dates[pos])
+        if value >= 0:
+            return f"{value // 10000:04d}/{value // 100 % 100:02d}/{value % 100:02d}"
+        if value == IRREGULAR:
+            return self.extra(pos)["metadata"]["date"]
+        return None
+
+    def record(self, pos):
+        extra = self.extra(pos)
+        meta = {}
+        for key, codes, values in (
+            ("source", self.source_codes, self.sources),
+            ("filename", self.filename_codes, self.filenames),
+        ):
+            if codes[pos] >= 0:
+                meta[key] = values[codes[pos]]
+        date = int(self.dates[pos])
+        if date != ABSENT:
+            meta["date"] = self.date(pos) if date != IRREGULAR else None
+        index = int(self.sentence_index[pos])
+        if index != ABSENT:
+            meta["sentence_index"] = index if index >= 0 else None
+        meta.update(extra.pop("metadata", {}))
+
+        rec = {"text": self.text(pos), "metadata": meta}
+        if self.stance_codes[pos] >= 0:
+            rec["stance"] = self.stances[self.stance_codes[pos]]
+        if not np.isnan(self.scores[pos]):
+            rec["score"] = float(self.scores[pos])
+        if self.has_spans[pos]:
+            lo, hi = self.span_offsets[pos], self.span_offsets[pos + 1]
+            rec["spans"] = [
+                {"start": int(s), "end": int(e), "label": self.labels[l]}
+                for s, e, l in zip(self.span_start[lo:hi], self.span_end[lo:hi], self.span_label[lo:hi])
+            ]
+        rec.update(extra)
+        return rec
+
+    def records(self, positions):
+        return [self.record(pos) for pos in positions]
+
+
+def read_jsonl(path, builder, start=0):
+    """
+    Add every record of `path` from byte offset `start` to `builder`.
+    A trailing line without a newline is only taken if it parses, since the
+    writer may still be in the middle of it. Returns the offset consumed up to.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        consumed = start
+        for line in f:
+            if not line.strip():
+                consumed += len(line)
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                if line.endswith(b"\n"):
+                    raise
+                break
+            consumed += len(line)
+            # sanity‐check shape:
+            if "text" not in rec or "metadata" not in rec:
+                continue
+            builder.add(rec)
+    return consumed
+
+
+def file_digest(path, length):
+    """Digest of the first `length` bytes of `path`."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while length > 0:
+            chunk = f.read(min(length, 1 << 20))
+            if not chunk:
+                break
+            h.update(chunk)
+            length -= len(chunk)
+    return h.hexdigest()
+
+
+def load_jsonl(path):
+    builder = StoreBuilder()
+    read_jsonl(path, builder)
+    return builder.build()
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _intern(interner, mapping, key, overflow):
+    if key not in mapping:
+        return ABSENT
+    code = interner.code(mapping[key])
+    if code == IRREGULAR:
+        overflow[key] = mapping[key]
+    return code
+
+
+def _encode_date(meta, overflow):
+    if "date" not in meta:
+        return ABSENT
+    date = meta["date"]
+    if date is None:
+        return NULL
+    m = DATE_PATTERN.match(date) if isinstance(date, str) else None
+    if not m:
+        overflow["date"] = date
+        return IRREGULAR
+    return int(m.group(1)) * 10000 + int(m.group(2)) * 100 + int(m.group(3))
+
+
+def _encode_index(meta, overflow):
+    if "sentence_index" not in meta:
+        return ABSENT
+    index = meta["sentence_index"]
+    if index is None:
+        return NULL
+    if not _is_int(index) or not 0 <= index < 2**31:
+        overflow["sentence_index"] = index
+        return IRREGULAR
+    return index
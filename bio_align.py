@@ -0,0 +1,112 @@
+# bio_align.py
+"""
+Character spans -> token-level BIO tags, shared by the NER evaluation and
+fine-tuning scripts so they all label tokens the same way.
+
+For a span (start, end, label) the tokens starting exactly at `start` are
+B-label (usually one; every one of them when several tokens share that start
+offset) and the following tokens that end at or before `end` are I-label.
+Tokens are located with a binary search over the sorted token offsets, so a
+sentence costs O(tokens + spans * log tokens) instead of a scan of every
+token for every span. Zero-width tokens ([CLS], [SEP], padding) are always O.
+When spans overlap, the later one in the list wins.
+
+tag_spans goes the other way, from predicted tags back to character spans.
+entity_spans and flatten_and_clean read the entity and stance fields of the
+gold records for the fine-tuning scripts.
+"""
+import collections.abc
+from bisect import bisect_left, bisect_right
+
+
+def bio_tags(offsets, spans):
+    """
+    offsets: [(tok_start, tok_end), ...] from a fast tokenizer's offset_mapping
+    spans:   [(start, end, label), ...] character offsets
+    Returns one "O" / "B-label" / "I-label" string per token.
+    """
+    tags = ["O"] * len(offsets)
+    if not spans:
+        return tags
+
+    # real (non-empty) tokens, whose starts and ends are both non-decreasing
+    index, starts, ends = [], [], []
+    for i, (s, e) in enumerate(offsets):
+        if e > s:
+            index.append(i)
+            starts.append(s)
+            ends.append(e)
+
+    for start, end, label in spans:
+        lo = bisect_left(starts, start)       # first token starting at/after the span
+        mid = bisect_right(starts, start)     # first token starting after it
+        hi = bisect_right(ends, end)          # tokens ending within the span
+        begin = f"B-{label}"
+        for j in range(lo, mid):              # all tokens that start at `start`
+            tags[index[j]] = begin
+        inside = f"I-{label}"
+        for j in range(mid, hi):
+            tags[index[j]] = inside
+    return tags
+
+
+def tag_spans(offsets, tags):
+    """
+    Inverse of bio_tags: [(start, end, label, token_indices), ...] for the
+    runs of B-/I- tags. An I- tag whose label differs from the open span
+    starts a new span, the same way the "simple" aggregation of the
+    transformers NER pipeline groups tokens. Zero-width tokens are skipped.
+    """
+    spans, current = [], None
+    for i, ((s, e), tag) in enumerate(zip(offsets, tags)):
+        if e <= s:
+            continue
+        if tag == "O":
+            current = None
+            continue
+        prefix, _, label = tag.partition("-")
+        if not label:
+            prefix, label = "I", tag
+        if current is None or prefix == "B" or current[2] != label:
+            current = [s, e, label, [i]]
+            spans.append(current)
+        else:
+            current[1] = e
+            current[3].append(i)
+    return [tuple(span) for span in spans]
+
+
+def entity_spans(entities, normalize=None):
+    """
+    (start, end, label) triples from gold spans ({"start", "end", "label"}),
+    doccano entities ({"start_offset", "end_offset", "label"}) or pipeline
+    output ({"start", "end", "entity_group"}). `normalize` maps labels into
+    the target schema; spans it maps to "O" are dropped.
+    """
+    out = []
+    for ent in entities:
+        # keys may be present but None when the records went through Arrow
+        start = ent.get("start")
+        if start is None:
+            start = ent.get("start_offset")
+        end = ent.get("end")
+        if end is None:
+            end = ent.get("end_offset")
+        label = ent.get("label") or ent.get("entity_group")
+        if normalize is not None:
+            label = normalize(label)
+            if label == "O":
+                continue
+        out.append((start, end, label))
+    return out
+
+
+def flatten_and_clean(x):
+    """Recursively flatten nested lists/tuples and keep only non-empty strings."""
+    out = []
+    if isinstance(x, str):
+        return [x] if x.strip() else []
+    if isinstance(x, collections.abc.Iterable):
+        for y in x:
+            out.extend(flatten_and_clean(y))
+    return [s for s in out if isinstance(s, str) and s.strip()]
@@ -1,53 +1,147 @@
 # build_manifest.py
+"""
+One manifest row per article with its header block:
 
-import os
+    source, filename, date, title, author, location, header_source
+
+(`source` is the article's folder, `header_source` its SOURCE: line), so later
+steps get the metadata without reopening the raw text.
+
+    python generate_manifest.py            # rescan only new / changed articles
+    python generate_manifest.py --full     # rescan everything
+
+Size, mtime, content hash and parsed header of every article are kept in
+MANIFEST_CACHE. A file whose size and mtime are unchanged is not opened; one
+that was touched but has the same hash is not re-parsed. The files that do
+need reading are read by a thread pool.
+"""
+import argparse
 import csv
+import hashlib
+import json
+import os
 import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
-# Configuration
-DATA_DIR     = "input_data/News Articles"             
-OUTPUT_CSV   = "manifest.csv"   
-DATE_PATTERN = re.compile(r"^PUBLISHED:\s*(\d{4}/\d{2}/\d{2})")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from articles import list_articles
 
-rows = []
+# Configuration
+DATA_DIR       = "input_data/News Articles"
+OUTPUT_CSV     = "manifest.csv"
+MANIFEST_CACHE = ".manifest_cache.json"
+WORKERS        = min(16, (os.cpu_count() or 1) * 4)    # I/O bound
+DATE_PATTERN   = re.compile(r"^PUBLISHED:\s*(\d{4}/\d{2}/\d{2})")
+HEADER_LINE    = re.compile(r"^([A-Z]+):\s*(.*)$")
+# header key -> manifest column
+HEADER_FIELDS  = {
+    "SOURCE":    "header_source",
+    "TITLE":     "title",
+    "AUTHOR":    "author",
+    "PUBLISHED": "date",
+    "LOCATION":  "location",
+}
+MAX_HEADER_LINES = 12      # non-empty lines searched for the header block
+FIELDNAMES = ["source", "filename", "date", "title", "author", "location", "header_source"]
 
-for source in os.listdir(DATA_DIR):
-    source_dir = os.path.join(DATA_DIR, source)
-    if not os.path.isdir(source_dir):
-        continue
 
-    for fname in os.listdir(source_dir):
-        if not fname.endswith(".txt"):
+def parse_header(lines):
+    """Header fields from the first lines of an article ("" when missing)."""
+    header = dict.fromkeys(HEADER_FIELDS.values(), "")
+    seen = 0
+    in_header = False
+    for raw in lines:
+        line = raw.strip()
+        if not line:
             continue
-        path = os.path.join(source_dir, fname)
-        
-        # Read the first non‐empty line
-        with open(path, encoding="latin-1") as f:
-            for i, raw in enumerate(f):
-                line = raw.strip()
-                if not line:
-                    continue                     
-
-                m = DATE_PATTERN.search(line)   
-                if m:
-                    date = m.group(1)
-                    print("  → date:", date)
-                    break                       
-
-                if i >= 5:
-                    break
-        
-        
-        rows.append({
-            "source": source,
-            "filename": fname,
-            "date": date
-        })
-
-
-with open(OUTPUT_CSV, "w", newline="", encoding="utf8") as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=["source","filename","date"])
-    writer.writeheader()
-    writer.writerows(rows)
-
-print(f"✅ Wrote {len(rows)} entries to {OUTPUT_CSV}")
\ No newline at end of file
+        seen += 1
+        m = HEADER_LINE.match(line)
+        if m and m.group(1) in HEADER_FIELDS:
+            in_header = True
+            column = HEADER_FIELDS[m.group(1)]
+            if column == "date":
+                date = DATE_PATTERN.match(line)
+                header["date"] = date.group(1) if date else ""
+            elif not header[column]:
+                header[column] = m.group(2).strip()
+        elif in_header:
+            break       # first body line after the header block
+        if seen >= MAX_HEADER_LINES:
+            break
+    return header
+
+
+def scan(path):
+    """(size, mtime_ns, blake2b, header) of one article."""
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    header = parse_header(data.decode("latin-1").splitlines())
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "blake2b": digest, "header": header}
+
+
+def rescan(path, cached):
+    """Cache entry for `path`, reading the file only if it may have changed."""
+    st = os.stat(path)
+    if cached and (cached["size"], cached["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+        return cached, False
+    entry = scan(path)
+    if cached and cached["blake2b"] == entry["blake2b"]:
+        return dict(cached, mtime_ns=entry["mtime_ns"]), False
+    return entry, True
+
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf8") as f:
+        return json.load(f)
+
+
+def write_json(path, obj):
+    with open(path + ".tmp", "w", encoding="utf8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def build_manifest(data_dir=DATA_DIR, cache_path=MANIFEST_CACHE, full=False, workers=WORKERS):
+    articles = list_articles(data_dir)
+    cache = {} if full else load_cache(cache_path)
+    keys = [f"{source}/{fname}" for source, fname, _ in articles]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            rescan, [path for _, _, path in articles], [cache.get(key) for key in keys]
+        ))
+
+    new_cache = {key: entry for key, (entry, _) in zip(keys, results)}
+    changed = sum(changed for _, changed in results)
+    write_json(cache_path, new_cache)     # entries of deleted articles are dropped
+
+    rows = []
+    for (source, fname, _), key in zip(articles, keys):
+        header = new_cache[key]["header"]
+        if not header["date"]:
+            print(f"  ! no PUBLISHED date in {key}")
+        rows.append({"source": source, "filename": fname, **header})
+    print(f"{len(articles)} articles: {changed} new or changed, {len(articles) - changed} unchanged")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the article manifest.")
+    parser.add_argument("--full", action="store_true", help="ignore the cache and rescan every article")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="threads reading article headers")
+    args = parser.parse_args()
+
+    rows = build_manifest(full=args.full, workers=args.workers)
+
+    with open(OUTPUT_CSV + ".tmp", "w", newline="", encoding="utf8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(OUTPUT_CSV + ".tmp", OUTPUT_CSV)
+
+    print(f"✅ Wrote {len(rows)} entries to {OUTPUT_CSV}")
@@ -1,35 +1,14 @@
-import pandas as pd
-import os, json, random, re
-from nltk.tokenize import sent_tokenize
+import os, json, random, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from articles import clean_article, load_dates, split_into_sentences
 
 DATA_DIR       = "input_data/News Articles"      
 MAX_ARTICLES   = 20           
 MAX_SENTENCES  = 1200         
 MANIFEST_CSV   = "manifest.csv"       
 
-def clean_article(text):
-    text = re.sub(r"<<\s*to continue reading.*?>>", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\n{2,}", "\n\n", text)
-    return text.strip()
-
-def split_into_sentences(text):
-    paras = text.split("\n\n")
-    sents = []
-    for para in paras:
-        para = para.strip()
-        if not para:
-            continue
-        for sent in sent_tokenize(para):
-            sent = sent.strip()
-            if sent:
-                sents.append(sent)
-    return sents
-
-file_dates = {}
-if MANIFEST_CSV:
-    df = pd.read_csv(MANIFEST_CSV)  
-    for _, row in df.iterrows():
-        file_dates[(row.source, row.filename)] = row.date
+file_dates = load_dates(MANIFEST_CSV) if MANIFEST_CSV else {}
 
 seed_rows = []
 
@@ -69,6 +48,7 @@ seed_rows = seed_rows[:MAX_SENTENCES]
 # Write JSONL
 with open("doccano_seed.jsonl", "w", encoding="utf8") as f:
     for row in seed_rows:
-        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        # allow_nan=False: fail loudly rather than write invalid JSON (NaN)
+        f.write(json.dumps(row, ensure_ascii=False, allow_nan=False) + "\n")
 
 print(f"✅ Prepared {len(seed_rows)} sentences")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Fine-tune joint_model.JointModel: one encoder with an NER head and a stance
+head, trained together on the gold file that fine_tune_ner.py and
+fine_tune_stance.py each use for one task. Saves to joint-finetuned/.
+"""
+import os
+import sys
+import datasets
+import numpy as np
+from sklearn.metrics import accuracy_score
+from transformers import (
+    AutoTokenizer,
+    DataCollatorForTokenClassification,
+    Trainer,
+    TrainingArguments,
+)
+from seqeval.metrics import classification_report, f1_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from bio_align import bio_tags, entity_spans, flatten_and_clean
+from joint_model import MAX_LENGTH, NER_LABELS, STANCE_LABELS, JointModel
+
+# 1) Config
+DATA_FILE = "phase1+2_gold.jsonl"
+# the stance model's encoder: RoBERTa is cased and its offsets work for NER
+MODEL_CHECKPOINT = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+OUTPUT_DIR       = "joint-finetuned"
+NER_LOSS_WEIGHT    = 1.0
+STANCE_LOSS_WEIGHT = 1.0
+
+ner2id    = {label: i for i, label in enumerate(NER_LABELS)}
+stance2id = {label: i for i, label in enumerate(STANCE_LABELS)}
+
+# 2) Load dataset and split 90/10 for train/validation (same split as fine_tune_ner.py)
+raw = datasets.load_dataset("json", data_files=DATA_FILE, split="train")
+split = raw.train_test_split(test_size=0.1, seed=42)
+train_ds, eval_ds = split["train"], split["test"]
+
+# 3) Tokenizer + labels for both heads from one tokenization
+tokenizer = AutoTokenizer.from_pretrained(MODEL_CHECKPOINT)
+
+def tokenize_and_label(batch):
+    tokenized = tokenizer(
+        batch["text"],
+        return_offsets_mapping=True,
+        truncation=True,
+        max_length=MAX_LENGTH,
+    )
+    labels = []
+    for offsets, entities in zip(tokenized.pop("offset_mapping"), batch["entities"]):
+        tags = bio_tags(offsets, entity_spans(entities))
+        # special tokens are left out of the loss; every real token is tagged
+        labels.append([ner2id[tag] if e > s else -100 for (s, e), tag in zip(offsets, tags)])
+    tokenized["labels"] = labels
+    # records without a stance only train the NER head
+    stances = [(flatten_and_clean(st) or [None])[0] for st in batch["stance"]]
+    tokenized["stance_labels"] = [stance2id[st] if st else -100 for st in stances]
+    return tokenized
+
+train_ds = train_ds.map(tokenize_and_label, batched=True, remove_columns=train_ds.column_names)
+eval_ds  = eval_ds.map(tokenize_and_label, batched=True, remove_columns=eval_ds.column_names)
+
+# 4) Data collator (pads `labels` with -100; `stance_labels` is one id per example)
+data_collator = DataCollatorForTokenClassification(tokenizer, pad_to_multiple_of=8)
+
+# 5) Model: pretrained encoder, fresh heads
+model = JointModel.from_encoder(
+    MODEL_CHECKPOINT,
+    ner_loss_weight=NER_LOSS_WEIGHT,
+    stance_loss_weight=STANCE_LOSS_WEIGHT,
+)
+
+# 6) Metrics for both heads
+def compute_metrics(p):
+    (ner_logits, stance_logits), (labels, stance_labels) = p.predictions, p.label_ids
+    preds = np.argmax(ner_logits, axis=-1)
+    true_labels = [[NER_LABELS[l] for l in seq if l != -100] for seq in labels]
+    true_preds  = [
+        [NER_LABELS[p] for (p, l) in zip(seq_pred, seq_lab) if l != -100]
+        for seq_pred, seq_lab in zip(preds, labels)
+    ]
+    print(classification_report(true_labels, true_preds, zero_division=0))
+
+    has_stance = stance_labels != -100
+    stance_preds = np.argmax(stance_logits, axis=-1)
+    return {
+        "ner_f1": f1_score(true_labels, true_preds, zero_division=0),
+        "stance_accuracy": accuracy_score(stance_labels[has_stance], stance_preds[has_stance]),
+    }
+
+# 7) Trainer
+args = TrainingArguments(
+    output_dir=OUTPUT_DIR,
+    learning_rate=5e-5,
+    per_device_train_batch_size=8,
+    per_device_eval_batch_size=8,
+    num_train_epochs=3,
+    weight_decay=0.01,
+    logging_dir=f"{OUTPUT_DIR}/logs",
+    logging_steps=100,
+    label_names=["labels", "stance_labels"],
+    group_by_length=True,
+)
+
+trainer = Trainer(
+    model=model,
+    args=args,
+    train_dataset=train_ds,
+    eval_dataset=eval_ds,
+    tokenizer=tokenizer,
+    data_collator=data_collator,
+    compute_metrics=compute_metrics,
+)
+
+# 8) Train
+if __name__ == "__main__":
+    trainer.train()
+    print(trainer.evaluate())
+    trainer.save_model(OUTPUT_DIR)
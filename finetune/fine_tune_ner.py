@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
-import json
+import hashlib
+import inspect
+import os
+import sys
 import datasets
 import numpy as np
 from transformers import (
@@ -11,22 +14,24 @@ from transformers import (
 )
 from seqeval.metrics import classification_report
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from bio_align import bio_tags, entity_spans
+
 # 1) Config
 DATA_FILE = "phase1+2_gold.jsonl" 
 LABEL_LIST = ["PER", "ORG", "LOC", "EVENT"]
 MODEL_CHECKPOINT = "bert-base-cased"
 OUTPUT_DIR       = "ner-finetuned"
+MAX_LENGTH       = 512
+NUM_PROC         = min(4, os.cpu_count() or 1)
+# tokenized splits, reused while the data, tokenizer and alignment are unchanged
+TOKENIZED_CACHE  = ".tokenized_cache"
 
 label2id   = {label: i for i, label in enumerate(LABEL_LIST)}
 id2label   = {i: label for label, i in label2id.items()}
 
-# 2) Load dataset
-def read_jsonl(path):
-    with open(path) as f:
-        for line in f:
-            yield json.loads(line)
-
-raw = datasets.Dataset.from_list(list(read_jsonl(DATA_FILE)))
+# 2) Load dataset (Arrow-backed, so the split and map results live on disk)
+raw = datasets.load_dataset("json", data_files=DATA_FILE, split="train")
 # split 90/10 for train/validation
 split = raw.train_test_split(test_size=0.1, seed=42)
 train_ds, eval_ds = split["train"], split["test"]
@@ -34,32 +39,52 @@ train_ds, eval_ds = split["train"], split["test"]
 # 3) Tokenizer + alignment
 tokenizer = AutoTokenizer.from_pretrained(MODEL_CHECKPOINT)
 
-def tokenize_and_align(ex):
+def tokenize_and_align(batch):
+    # one fast-tokenizer call per batch; its offsets feed the BIO alignment
     tokenized = tokenizer(
-        ex["text"],
+        batch["text"],
         return_offsets_mapping=True,
         truncation=True,
-        max_length=512,
+        max_length=MAX_LENGTH,
     )
     labels = []
-    offsets = tokenized.pop("offset_mapping")
-    for idx, (start, end) in enumerate(offsets):
-        label = "O"
-        for ent in ex["entities"]:
-            s = ent.get("start", ent.get("start_offset"))
-            e = ent.get("end",   ent.get("end_offset"))
-            if start == s:
-                label = f"B-{ent['label']}"
-                break
-            elif start >= s and end <= e:
-                label = f"I-{ent['label']}"
-                break
-        labels.append(label2id[label.split("-",1)[-1]] if label!="O" else -100)
+    for offsets, entities in zip(tokenized.pop("offset_mapping"), batch["entities"]):
+        tags = bio_tags(offsets, entity_spans(entities))
+        labels.append([label2id[tag.split("-",1)[-1]] if tag!="O" else -100 for tag in tags])
     tokenized["labels"] = labels
     return tokenized
 
-train_ds = train_ds.map(tokenize_and_align, batched=False)
-eval_ds  = eval_ds.map(tokenize_and_align,  batched=False)
+def tokenization_fingerprint():
+    """
+    Changes whenever the data, the tokenizer, the labels or the alignment code
+    (bio_align.py and tokenize_and_align itself) do. It replaces the datasets
+    fingerprint of the map call, so anything that shapes the output goes in here.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(DATA_FILE, "rb") as f:
+        h.update(f.read())
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bio_align.py"), "rb") as f:
+        h.update(f.read())
+    h.update(inspect.getsource(tokenize_and_align).encode())
+    h.update(tokenizer.backend_tokenizer.to_str().encode())
+    h.update(repr((MODEL_CHECKPOINT, LABEL_LIST, MAX_LENGTH)).encode())
+    return h.hexdigest()
+
+def tokenize_cached(ds, name, fingerprint):
+    os.makedirs(TOKENIZED_CACHE, exist_ok=True)
+    return ds.map(
+        tokenize_and_align,
+        batched=True,
+        num_proc=NUM_PROC,
+        new_fingerprint=f"{name}-{fingerprint}",
+        cache_file_name=os.path.join(TOKENIZED_CACHE, f"{name}-{fingerprint}.arrow"),
+        load_from_cache_file=True,
+        desc=f"Tokenizing {name}",
+    )
+
+fingerprint = tokenization_fingerprint()
+train_ds = tokenize_cached(train_ds, "train", fingerprint)
+eval_ds  = tokenize_cached(eval_ds,  "eval",  fingerprint)
 
 # 4) Data collator
 data_collator = DataCollatorForTokenClassification(tokenizer)
@@ -96,7 +121,6 @@ args = TrainingArguments(
     weight_decay=0.01,
     logging_dir=f"{OUTPUT_DIR}/logs",
     logging_steps=100,
-    weight_decay=0.01
 )
 
 trainer = Trainer(
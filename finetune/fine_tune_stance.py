@@ -1,5 +1,6 @@
+import os
+import sys
 import numpy as np
-import collections.abc
 from sklearn.metrics import accuracy_score
 from datasets import load_dataset, ClassLabel
 
@@ -7,13 +8,22 @@ from datasets import load_dataset, ClassLabel
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
+    DataCollatorWithPadding,
     TrainingArguments,
     Trainer
 )
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from bio_align import flatten_and_clean
+
 DATA_PATH = "phase1+2_gold.jsonl"
 LABELS    = ["NEU", "POS", "NEG"]
 OUTPUT_DIR = "stance-finetuned"
+# "dynamic": pad each batch to its longest example, batches grouped by length,
+#            truncated at MAX_LENGTH_PERCENTILE of the corpus token lengths
+# "max_length": pad every example to 512 (the original setup, for comparison)
+PADDING    = os.environ.get("STANCE_PADDING", "dynamic")
+MAX_LENGTH_PERCENTILE = 99
 
 # 1) define ClassLabel so we get .str2int mapping
 class_label = ClassLabel(names=LABELS)
@@ -24,23 +34,20 @@ tokenizer = AutoTokenizer.from_pretrained(
 label_map = {"STANCE_NEG": 0, "STANCE_NEU": 1, "STANCE_POS": 2}
 
 
-def flatten_and_clean(x):
-    """Recursively flatten nested lists/tuples and keep only non-empty strings."""
-    out = []
-    if isinstance(x, str):
-        return [x]
-    if isinstance(x, collections.abc.Iterable):
-        for y in x:
-            out.extend(flatten_and_clean(y))
-    return [s for s in out if isinstance(s, str) and s.strip()]
+def corpus_max_length(texts, percentile=MAX_LENGTH_PERCENTILE):
+    """Token length covering `percentile`% of the texts, rounded up to a multiple of 8."""
+    lengths = [len(ids) for ids in tokenizer(texts)["input_ids"]]
+    max_length = int(np.ceil(np.percentile(lengths, percentile) / 8) * 8)
+    return min(max_length, 512)
 
 def preprocess(examples):
-    # 1) Tokenize the entire batch of texts
+    # 1) Tokenize the entire batch of texts (padding is left to the collator
+    #    in dynamic mode)
     tokenized = tokenizer(
         examples["text"],
-        padding="max_length",
+        padding="max_length" if PADDING == "max_length" else False,
         truncation=True,
-        max_length=512,
+        max_length=MAX_LENGTH,
     )
 
     # 2) Build a label list of the same length as the batch
@@ -71,9 +78,24 @@ def compute_accuracy(eval_pred):
     acc = accuracy_score(labels, preds)
     return {"accuracy": acc}
 
+class TokenCounter:
+    """Wraps a collator and counts the real / padded tokens it hands the model."""
+
+    def __init__(self, collator):
+        self.collator = collator
+        self.real = self.padded = 0
+
+    def __call__(self, features):
+        batch = self.collator(features)
+        self.padded += batch["input_ids"].numel()
+        self.real += int(batch["attention_mask"].sum())
+        return batch
+
 # 2) load & map
 dataset = load_dataset("json", data_files=DATA_PATH, split="train")
+MAX_LENGTH = 512 if PADDING == "max_length" else corpus_max_length(dataset["text"])
 dataset = dataset.map(preprocess, remove_columns=dataset.column_names, batched=True)
+data_collator = TokenCounter(DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8))
 
 
 model = AutoModelForSequenceClassification.from_pretrained(
@@ -87,7 +109,8 @@ args = TrainingArguments(
     num_train_epochs=3,
     logging_dir=f"{OUTPUT_DIR}/logs",
     logging_steps=100,
-    weight_decay=0.01
+    weight_decay=0.01,
+    group_by_length=PADDING != "max_length",
 )
 
 trainer = Trainer(
@@ -96,10 +119,16 @@ trainer = Trainer(
     train_dataset=dataset,
     eval_dataset=dataset, 
     tokenizer=tokenizer,
+    data_collator=data_collator,
     compute_metrics=compute_accuracy,  
 )
 
 # 8) Train
 if __name__ == "__main__":
-    trainer.train()
+    result = trainer.train()
+    secs = result.metrics["train_runtime"]
+    print(f"padding={PADDING} max_length={MAX_LENGTH}: "
+          f"{data_collator.real / secs:.0f} real tokens/s, "
+          f"{data_collator.padded / secs:.0f} padded tokens/s, "
+          f"{result.metrics['train_samples_per_second']:.2f} samples/s")
     trainer.save_model(OUTPUT_DIR)
\ No newline at end of file
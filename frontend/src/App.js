@@ -8,6 +8,8 @@ import 'tippy.js/dist/tippy.css';
 
 function App() {
   const [results, setResults] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
   const [source, setSource] = useState('All News Today');
   const [entities, setEntities] = useState('PER');
   const [stances, setStances] = useState('STANCE_POS');
@@ -29,7 +31,7 @@ function App() {
   };
 
 
-  const handleFetch = useCallback(async () => {
+  const handleFetch = useCallback(async (cursor = null) => {
     setLoading(true);
 
     const qs = new URLSearchParams({
@@ -38,20 +40,31 @@ function App() {
       stances,
       min_score: minScore,
       limit,
+      sort: 'source',
+      fields: 'text,stance,score,spans,metadata',
+      format: 'ndjson',
     });
+    if (cursor) qs.set('cursor', cursor);
 
     const res = await fetch(`http://127.0.0.1:5005/predictions?${qs}`);
-    const data = await res.json();
-    
-    data.sort((a, b) => {
-      const srcA = a.metadata.source.toLowerCase();
-      const srcB = b.metadata.source.toLowerCase();
-      if (srcA < srcB) return -1;
-      if (srcA > srcB) return 1;
-      return 0;
-    });
-    
-    setResults(data);
+    setTotal(Number(res.headers.get('X-Total-Count') || 0));
+    setNextCursor(res.headers.get('X-Next-Cursor'));
+    if (!cursor) setResults([]);
+
+    // rows arrive sorted by source, one JSON document per line; render each
+    // batch as soon as it is read instead of waiting for the whole body
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+      const lines = buffered.split('\n');
+      buffered = done ? '' : lines.pop();
+      const rows = lines.filter(line => line.trim()).map(line => JSON.parse(line));
+      if (rows.length > 0) setResults(prev => [...prev, ...rows]);
+      if (done) break;
+    }
     setLoading(false);
 
   }, [source, entities, stances, minScore, limit]);
@@ -155,7 +168,7 @@ function App() {
 
         {/* Fetch Button */}
         <button
-          onClick={handleFetch}
+          onClick={() => handleFetch()}
           disabled={loading}
           className="h-12 px-6 ml-4 bg-indigo-600 text-white font-semibold 
           rounded-lg shadow hover:bg-indigo-700 focus:outline-none focus:ring-2 focus:ring-indigo-400
@@ -211,6 +224,25 @@ function App() {
         }
       </div >
 
+      {results && results.length > 0 && (
+        <div className="flex flex-col items-center mt-8 gap-3">
+          <p className="text-sm text-gray-500">
+            Showing {results.length} of {total} matching sentences
+          </p>
+          {nextCursor && (
+            <button
+              onClick={() => handleFetch(nextCursor)}
+              disabled={loading}
+              className="h-10 px-6 bg-white text-indigo-600 font-semibold border border-indigo-600
+              rounded-lg shadow hover:bg-indigo-50 focus:outline-none focus:ring-2 focus:ring-indigo-400
+              cursor-pointer"
+            >
+              {loading ? 'Loading…' : 'Load more'}
+            </button>
+          )}
+        </div>
+      )}
+
       <Modal isOpen={modalOpen} onClose={closeModal} record={selected} />
 
       {(!results || results.length === 0) && (
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Label every sentence of every article in input_data/News Articles with the
+fine-tuned NER and stance models.
+
+    python inference/label_corpus.py            # start, or resume where it stopped
+    python inference/label_corpus.py --restart  # throw away progress and start over
+    python inference/label_corpus.py --joint    # one joint-finetuned/ pass per batch
+
+Articles are read one at a time and split into sentences, and the sentences
+are batched across article boundaries. Results are appended to
+corpus_predictions/shard-00000.jsonl, shard-00001.jsonl, ... in the
+bootstrapped_labels_2.0.jsonl record format. Nothing is held in memory beyond
+the current window of sentences, so memory stays flat however large the
+corpus is. With --joint, spans and stance come from the single shared-encoder
+model (joint_model.py) instead of the separate NER and stance models.
+
+After each window, progress (articles finished, current shard, byte offset) is
+written to corpus_predictions/checkpoint.json. A resumed run truncates the
+shard to that offset, dropping the partial article, and skips the finished
+articles. The checkpoint also holds a digest of the finished articles'
+identities (source/filename), so a resume refuses to continue if articles
+were added, removed or renamed among them since; new articles after that
+point are simply labeled when the run gets to them.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from itertools import islice
+from transformers import AutoModelForSequenceClassification, AutoModelForTokenClassification, pipeline
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from articles import DATA_DIR, clean_article, list_articles, load_dates, read_article, split_into_sentences
+from pipeline_outputs import to_prediction
+from quantize import load_model
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1) Configuration
+# ──────────────────────────────────────────────────────────────────────────────
+
+MANIFEST_CSV     = "doccano_generate_seed/manifest.csv"
+NER_MODEL_DIR    = "ner-finetuned/"
+STANCE_MODEL_DIR = "stance-finetuned/"
+JOINT_MODEL_DIR  = "joint-finetuned/"
+OUT_DIR          = "corpus_predictions"
+CHECKPOINT       = "checkpoint.json"
+
+BATCH_SIZE  = 32      # sentences per forward pass
+WINDOW      = 512     # sentences read ahead, sorted by length into batches
+SHARD_SIZE  = 20000   # records per shard (rotated at article boundaries)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2) Input: lazy sentence stream
+# ──────────────────────────────────────────────────────────────────────────────
+
+def iter_sentences(articles, dates, start=0):
+    """Yield (article_number, record) for articles[start:], one article at a time."""
+    for n, (source, fname, path) in enumerate(articles[start:], start):
+        sentences = split_into_sentences(clean_article(read_article(path)))
+        for idx, sent in enumerate(sentences):
+            yield n, {
+                "text": sent,
+                "metadata": {
+                    "source": source,
+                    "filename": fname,
+                    "date": dates.get((source, fname)),
+                    "sentence_index": idx,
+                },
+            }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3) Inference
+# ──────────────────────────────────────────────────────────────────────────────
+
+def separate_predictor(ner_pipe, stance_pipe):
+    """predict(texts) -> [(entities, stance)] with one NER and one stance pass."""
+    def predict(texts):
+        ents = ner_pipe(texts, batch_size=BATCH_SIZE)
+        stances = stance_pipe(texts, batch_size=BATCH_SIZE, truncation=True)
+        return zip(ents, stances)
+    return predict
+
+
+def joint_predictor(joint_pipe):
+    """predict(texts) -> [(entities, stance)] from one shared-encoder pass."""
+    def predict(texts):
+        return [(out["entities"], out["stance"]) for out in joint_pipe(texts, batch_size=BATCH_SIZE)]
+    return predict
+
+
+def label_window(records, predict):
+    """Fill in spans / stance / score for one window of records, in place."""
+    order = sorted(range(len(records)), key=lambda i: len(records[i]["text"]))
+    texts = [records[i]["text"] for i in order]
+    for i, (ann, st) in zip(order, predict(texts)):
+        rec = records[i]
+        rec.update(to_prediction(ann, st))
+        rec["score"] = round(rec["score"], 3)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 4) Output: shards + checkpoint
+# ──────────────────────────────────────────────────────────────────────────────
+
+def shard_path(shard):
+    return os.path.join(OUT_DIR, f"shard-{shard:05d}.jsonl")
+
+
+def done_digest(articles, h=None):
+    """Running digest of article identities; extend `h` with more articles."""
+    h = h or hashlib.blake2b(digest_size=16)
+    for source, fname, _ in articles:
+        h.update(f"{source}/{fname}\n".encode("utf8"))
+    return h
+
+
+def load_checkpoint():
+    path = os.path.join(OUT_DIR, CHECKPOINT)
+    if not os.path.exists(path):
+        return {"articles_done": 0, "shard": 0, "offset": 0, "shard_records": 0, "records": 0,
+                "done_digest": done_digest([]).hexdigest()}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(state):
+    path = os.path.join(OUT_DIR, CHECKPOINT)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def open_shard(shard, offset):
+    """Open a shard for writing at `offset`, dropping anything written after it."""
+    path = shard_path(shard)
+    open(path, "ab").close()
+    f = open(path, "r+b")
+    f.truncate(offset)
+    f.seek(offset)
+    return f
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 5) Main loop
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run(articles, dates, predict):
+    os.makedirs(OUT_DIR, exist_ok=True)
+    ckpt = load_checkpoint()
+    digest = done_digest(articles[:ckpt["articles_done"]])
+    if digest.hexdigest() != ckpt.get("done_digest"):
+        sys.exit(f"{OUT_DIR}/{CHECKPOINT} was written for a different list of the first "
+                 f"{ckpt['articles_done']} articles (articles added, removed or renamed since); "
+                 f"re-run with --restart")
+    print(f"Resuming at article {ckpt['articles_done']}/{len(articles)}, "
+          f"shard {ckpt['shard']}, {ckpt['records']} records written")
+
+    shard, shard_records, records = ckpt["shard"], ckpt["shard_records"], ckpt["records"]
+    out = open_shard(shard, ckpt["offset"])
+    stream = iter_sentences(articles, dates, ckpt["articles_done"])
+    current = ckpt["articles_done"]       # article the next record belongs to
+    start, done = time.perf_counter(), 0
+
+    while True:
+        window = list(islice(stream, WINDOW))
+        if not window:
+            break
+        label_window([rec for _, rec in window], predict)
+
+        for n, rec in window:
+            if n != current:
+                # every article before `n` is complete: a safe point to resume from
+                done_digest(articles[current:n], digest)
+                current = n
+                if shard_records >= SHARD_SIZE:
+                    out.close()
+                    shard, shard_records = shard + 1, 0
+                    out = open_shard(shard, 0)
+                ckpt = {"articles_done": n, "shard": shard, "offset": out.tell(),
+                        "shard_records": shard_records, "records": records,
+                        "done_digest": digest.hexdigest()}
+            out.write((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf8"))
+            shard_records += 1
+            records += 1
+            done += 1
+
+        out.flush()
+        os.fsync(out.fileno())
+        save_checkpoint(ckpt)
+        rate = done / max(time.perf_counter() - start, 1e-9)
+        print(f"  article {current + 1}/{len(articles)}  {records} records  {rate:.1f} sents/s")
+
+    out.flush()
+    os.fsync(out.fileno())
+    done_digest(articles[current:], digest)
+    save_checkpoint({"articles_done": len(articles), "shard": shard, "offset": out.tell(),
+                     "shard_records": shard_records, "records": records,
+                     "done_digest": digest.hexdigest()})
+    out.close()
+    print(f"Done: {records} records in {shard + 1} shard(s) under {OUT_DIR}/")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Label the whole article corpus.")
+    parser.add_argument("--restart", action="store_true", help="discard shards and checkpoint")
+    parser.add_argument("--joint", action="store_true",
+                        help=f"use the joint NER + stance model in {JOINT_MODEL_DIR}")
+    args = parser.parse_args()
+    if args.restart:
+        shutil.rmtree(OUT_DIR, ignore_errors=True)
+
+    articles = list_articles(DATA_DIR)
+    dates = load_dates(MANIFEST_CSV)
+    print(f"{len(articles)} articles under {DATA_DIR}")
+
+    if args.joint:
+        from joint_model import JointPipeline
+
+        predict = joint_predictor(JointPipeline(JOINT_MODEL_DIR, batch_size=BATCH_SIZE))
+    else:
+        ner_pipe = pipeline(
+            "ner",
+            model=load_model(AutoModelForTokenClassification, NER_MODEL_DIR),
+            tokenizer=NER_MODEL_DIR,
+            aggregation_strategy="simple",
+        )
+        stance_pipe = pipeline(
+            "text-classification",
+            model=load_model(AutoModelForSequenceClassification, STANCE_MODEL_DIR),
+            tokenizer=STANCE_MODEL_DIR,
+        )
+        predict = separate_predictor(ner_pipe, stance_pipe)
+    run(articles, dates, predict)
@@ -1,50 +1,29 @@
 #!/usr/bin/env python3
-import json
-import random
+import os
+import sys
+import time
 from transformers import (
     AutoTokenizer,
     AutoModelForTokenClassification,
     pipeline
 )
-from seqeval.metrics import classification_report
+from seqeval.metrics import classification_report, f1_score
 
-ORIGINAL_FILE = "bootstrapped_labels_2.0.jsonl"
-GOLD_300_FILE = "phase1+2_gold.jsonl"
-MODEL_DIR     = "ner-finetuned/"
-
-# -----------------------------------------------------------------------------
-# 1) Read the 300 gold examples, remember their unique IDs
-# -----------------------------------------------------------------------------
-gold_ids = set()
-with open(GOLD_300_FILE) as f:
-    for line in f:
-        rec = json.loads(line)
-        uid = f"{rec['metadata']['filename']}|{rec['metadata']['date']}"
-        gold_ids.add(uid)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from bio_align import bio_tags, entity_spans
+from inference_cache import cached
+from onnx_backend import load_pipeline
+from quantize import ENABLED as QUANTIZE, load_model
+from splits import load_splits
 
-# -----------------------------------------------------------------------------
-# 2) Filter the original 1,200 down to the “unseen” set (~500)
-# -----------------------------------------------------------------------------
-remaining = []
-with open(ORIGINAL_FILE) as f:
-    for line in f:
-        rec = json.loads(line)
-        uid = f"{rec['metadata']['filename']}|{rec['metadata']['date']}"
-        if uid not in gold_ids:
-            remaining.append(rec)
-
-print(f"Unseen examples (should be ~400): {len(remaining)}")
+MODEL_DIR     = "ner-finetuned/"
+BATCH_SIZE    = 16
 
 # -----------------------------------------------------------------------------
-# 3) Split into DEV (10%), TEST (10%), HOLDOUT (80%)
+# 1-3) DEV (10%) / TEST (10%) of the records not in the gold set, from the
+#      split shared with real_stance_inference.py (eval_splits.json, see splits.py)
 # -----------------------------------------------------------------------------
-random.seed(42)
-random.shuffle(remaining)
-dev_size  = int(0.1 * len(remaining))
-test_size = dev_size
-
-dev_set  = remaining[:dev_size]
-test_set = remaining[dev_size : dev_size + test_size]
+dev_set, test_set = load_splits("dev", "test")
 
 print(f"DEV size:  {len(dev_set)}")
 print(f"TEST size: {len(test_set)}")
@@ -61,86 +40,69 @@ def normalize_label(lab: str) -> str:
         return "O"
     return lab
 
-def gold_to_bio_spans(text, spans, tokenizer):
-    toks = tokenizer(text, return_offsets_mapping=True, add_special_tokens=False)
-    offsets = toks["offset_mapping"]
-    labels  = ["O"] * len(offsets)
-
-    for span in spans:
-        start, end = span["start"], span["end"]
-        raw_lab    = span["label"]
-        lab        = normalize_label(raw_lab)
-
-        # skip if you want to treat MISC as O
-        if lab == "O":
-            continue
-
-        for idx, (s, e) in enumerate(offsets):
-            if s == start:
-                labels[idx] = f"B-{lab}"
-            elif s > start and e <= end:
-                labels[idx] = f"I-{lab}"
-
-    return labels, offsets
+def gold_to_bio_spans(spans, offsets):
+    # spans normalized to "O" (MISC) are skipped
+    return bio_tags(offsets, entity_spans(spans, normalize_label))
 
 def ner_preds_to_bio(preds, offsets):
-    labels = ["O"] * len(offsets)
-    for ent in preds:
-        raw_lab = ent["entity_group"]
-        lab = normalize_label(raw_lab)
-        if lab == "O":
-            continue
-
-        start, end = ent["start"], ent["end"]
-        for i, (s, e) in enumerate(offsets):
-            if s == start:
-                labels[i] = f"B-{lab}"
-            elif s > start and e <= end:
-                labels[i] = f"I-{lab}"
-    return labels
+    return bio_tags(offsets, entity_spans(preds, normalize_label))
 
 # -----------------------------------------------------------------------------
 # 5) Run inference + evaluate
 # -----------------------------------------------------------------------------
-def run_ner_and_eval(dataset, ner_pipe, tokenizer):
+def run_ner_and_eval(dataset, ner_pipe, tokenizer, batch_size=BATCH_SIZE):
+    texts = [rec["text"] for rec in dataset]
+    start = time.perf_counter()
+
+    # a) tokenize everything once; these offsets serve gold and predictions
+    enc = tokenizer(texts, return_offsets_mapping=True, add_special_tokens=False)
+    offsets = enc["offset_mapping"]
+
+    # b) run model over texts sorted by length, so each batch pads to
+    #    roughly its own length instead of the longest text in the set
+    order = sorted(range(len(texts)), key=lambda i: len(enc["input_ids"][i]))
+    anns = [None] * len(texts)
+    outputs = ner_pipe((texts[i] for i in order), batch_size=batch_size)
+    for i, ann in zip(order, outputs):
+        anns[i] = ann
+
+    # c) align gold and preds → BIO
     gold_seqs = []
     pred_seqs = []
+    for rec, ann, offs in zip(dataset, anns, offsets):
+        gold_seqs.append(gold_to_bio_spans(rec["spans"], offs))   # your gold spans field
+        pred_seqs.append(ner_preds_to_bio(ann, offs))
 
-    for rec in dataset:
-        text  = rec["text"]
-        spans = rec["spans"]       # your gold spans field
-
-        # a) run model
-        ann = ner_pipe(text)
-
-        # b) align gold → BIO
-        bio_gold, offsets = gold_to_bio_spans(text, spans, tokenizer)
-
-        # c) align preds → BIO
-        bio_pred = ner_preds_to_bio(ann, offsets)
-
-        gold_seqs.append(bio_gold)
-        pred_seqs.append(bio_pred)
-
+    elapsed = time.perf_counter() - start
     print(classification_report(gold_seqs, pred_seqs, zero_division=0))
+    print(f"{len(texts)} texts in {elapsed:.1f}s ({len(texts) / max(elapsed, 1e-9):.1f} texts/s, batch_size={batch_size})")
+    return f1_score(gold_seqs, pred_seqs, zero_division=0), elapsed
 
 # -----------------------------------------------------------------------------
 # 6) Load model + tokenizer + pipeline
 # -----------------------------------------------------------------------------
+# INFERENCE_BACKEND=onnx runs ner-finetuned-onnx/ (see onnx_backend.py) instead of torch
 tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-model     = AutoModelForTokenClassification.from_pretrained(MODEL_DIR)
-ner_pipe  = pipeline(
-    "ner",
-    model=model,
-    tokenizer=tokenizer,
-    aggregation_strategy="simple"
-)
+ner_pipe  = cached(load_pipeline("ner", MODEL_DIR, aggregation_strategy="simple"))
+
+# INFERENCE_QUANTIZE=1: also evaluate a dynamic int8 copy and report the delta
+ner_pipe_int8 = None
+if QUANTIZE:
+    ner_pipe_int8 = cached(pipeline(
+        "ner",
+        model=load_model(AutoModelForTokenClassification, MODEL_DIR, quantize=True),
+        tokenizer=tokenizer,
+        aggregation_strategy="simple"
+    ))
 
 # -----------------------------------------------------------------------------
 # 7) Eval on dev, then test
 # -----------------------------------------------------------------------------
-print("\n=== DEV SET RESULTS ===")
-run_ner_and_eval(dev_set, ner_pipe, tokenizer)
-
-print("\n=== TEST SET RESULTS ===")
-run_ner_and_eval(test_set, ner_pipe, tokenizer)
+for name, ds in (("DEV", dev_set), ("TEST", test_set)):
+    print(f"\n=== {name} SET RESULTS ===")
+    f1, secs = run_ner_and_eval(ds, ner_pipe, tokenizer)
+    if ner_pipe_int8 is not None:
+        print(f"\n=== {name} SET RESULTS (int8) ===")
+        f1_q, secs_q = run_ner_and_eval(ds, ner_pipe_int8, tokenizer)
+        print(f"int8 vs fp32: micro F1 {f1_q:.4f} vs {f1:.4f} ({f1_q - f1:+.4f}), "
+              f"time {secs_q:.1f}s vs {secs:.1f}s")
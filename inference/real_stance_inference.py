@@ -1,17 +1,20 @@
 #!/usr/bin/env python3
-import json
-import random
-from collections import defaultdict
-from transformers import pipeline
-from sklearn.model_selection import train_test_split
+import os
+import sys
+import time
+from transformers import AutoModelForSequenceClassification, pipeline
 from sklearn.metrics import classification_report, accuracy_score
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from inference_cache import cached
+from onnx_backend import load_pipeline
+from quantize import ENABLED as QUANTIZE, load_model
+from splits import load_splits, split_sizes
+
 # ──────────────────────────────────────────────────────────────────────────────
 # 1) Configuration
 # ──────────────────────────────────────────────────────────────────────────────
 
-ORIGINAL_FILE = "bootstrapped_labels_2.0.jsonl"
-GOLD_300_FILE = "phase1+2_gold.jsonl"
 MODEL_DIR     = "stance-finetuned/"
 
 # your three target labels:
@@ -34,75 +37,6 @@ def normalize_pred_label(raw: str) -> str:
     return "NEU"
 
 
-def load_gold_ids(path: str):
-    """Return set of uid = 'filename|date' for the 300 examples."""
-    s = set()
-    with open(path) as f:
-        for line in f:
-            rec = json.loads(line)
-            uid = f"{rec['metadata']['filename']}|{rec['metadata']['date']}"
-            s.add(uid)
-    return s
-
-
-def load_unseen(original_path: str, gold_ids: set):
-    """Filter out gold_ids from the full bootstrapped set."""
-    out = []
-    with open(original_path) as f:
-        for line in f:
-            rec = json.loads(line)
-            uid = f"{rec['metadata']['filename']}|{rec['metadata']['date']}"
-            if uid not in gold_ids:
-                out.append(rec)
-    return out
-
-
-def split_sets(dataset, test_frac=0.1, dev_frac=0.1, seed=42):
-    """
-    Stratified split into dev/test/holdout.
-    - test_frac & dev_frac are fractions of the total.
-    - holdout_frac = 1 - (dev_frac + test_frac).
-    """
-    # Bucket by stance
-    by_label = defaultdict(list)
-    for rec in dataset:
-        lbl = rec["stance"].replace("STANCE_", "")
-        by_label[lbl].append(rec)
-
-    dev_set, test_set, holdout = [], [], []
-    # For each label, carve off dev/test/holdout
-    for lbl, recs in by_label.items():
-        # First take out dev+test as a pool
-        pool_frac = dev_frac + test_frac
-        pool, hold = train_test_split(
-            recs,
-            test_size=1 - pool_frac,
-            random_state=seed,
-            stratify=[lbl] * len(recs)
-        )
-
-        # Then split pool into dev vs test
-        # relative fractions: dev_frac/(dev_frac+test_frac), test_frac/(dev_frac+test_frac)
-        rel_test_size = test_frac / pool_frac
-        d, t = train_test_split(
-            pool,
-            test_size=rel_test_size,
-            random_state=seed,
-            stratify=[lbl] * len(pool)
-        )
-
-        dev_set.extend(d)
-        test_set.extend(t)
-        holdout.extend(hold)
-
-    # Shuffle to mix labels
-    random.seed(seed)
-    random.shuffle(dev_set)
-    random.shuffle(test_set)
-    random.shuffle(holdout)
-
-    return dev_set, test_set, holdout
-
 # ──────────────────────────────────────────────────────────────────────────────
 # 3) Inference + evaluation
 # ──────────────────────────────────────────────────────────────────────────────
@@ -111,6 +45,7 @@ def run_stance_and_eval(dataset, stance_pipe):
     # gold labels, stripped of the 'STANCE_' prefix
     gold = [rec["stance"].replace("STANCE_", "") for rec in dataset]
     texts = [rec["text"] for rec in dataset]
+    start = time.perf_counter()
 
     # model returns list of lists of dicts if return_all_scores=True
     raw_outputs = stance_pipe(
@@ -138,7 +73,9 @@ def run_stance_and_eval(dataset, stance_pipe):
     ))
     # also show accuracy
     acc = accuracy_score(gold, preds)
-    print(f"Overall accuracy: {acc:.4f}\n")
+    elapsed = time.perf_counter() - start
+    print(f"Overall accuracy: {acc:.4f}  ({len(texts)} texts in {elapsed:.1f}s)\n")
+    return acc, elapsed
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -146,14 +83,12 @@ def run_stance_and_eval(dataset, stance_pipe):
 # ──────────────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
-    # load and split data
-    gold_ids  = load_gold_ids(GOLD_300_FILE)
-    all_unseen = load_unseen(ORIGINAL_FILE, gold_ids)
-    dev_set, test_set, hold_set = split_sets(all_unseen)
+    # shared split (eval_splits.json, see splits.py): only DEV and TEST are read
+    dev_set, test_set = load_splits("dev", "test")
 
     print(f"DEV size  : {len(dev_set)}   (≈10% of unseen)")
     print(f"TEST size : {len(test_set)}  (≈10% of unseen)")
-    print(f"HOLD size : {len(hold_set)}  (≈80% of unseen)")
+    print(f"HOLD size : {split_sizes()['holdout']}  (≈80% of unseen)")
 
     # load tokenizer & model (ensure config has correct id2label/label2id)
     # if you need to re‑save your fine‑tuned model with proper config:
@@ -166,17 +101,31 @@ if __name__ == "__main__":
     # model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR, config=config)
 
     # otherwise, assume MODEL_DIR already has a correct config.json
-    stance_pipe = pipeline(
+    # (INFERENCE_BACKEND=onnx runs stance-finetuned-onnx/ instead, see onnx_backend.py)
+    stance_pipe = cached(load_pipeline(
         "text-classification",
-        model=MODEL_DIR,
-        tokenizer=MODEL_DIR,
+        MODEL_DIR,
         top_k=None,
         batch_size=16,
-    )
+    ))
 
-    # evaluate
-    print("\n=== DEV SET STANCE RESULTS ===")
-    run_stance_and_eval(dev_set, stance_pipe)
+    # INFERENCE_QUANTIZE=1: also evaluate a dynamic int8 copy and report the delta
+    stance_pipe_int8 = None
+    if QUANTIZE:
+        stance_pipe_int8 = cached(pipeline(
+            "text-classification",
+            model=load_model(AutoModelForSequenceClassification, MODEL_DIR, quantize=True),
+            tokenizer=MODEL_DIR,
+            top_k=None,
+            batch_size=16,
+        ))
 
-    print("\n=== TEST SET STANCE RESULTS ===")
-    run_stance_and_eval(test_set, stance_pipe)
+    # evaluate
+    for name, ds in (("DEV", dev_set), ("TEST", test_set)):
+        print(f"\n=== {name} SET STANCE RESULTS ===")
+        acc, secs = run_stance_and_eval(ds, stance_pipe)
+        if stance_pipe_int8 is not None:
+            print(f"\n=== {name} SET STANCE RESULTS (int8) ===")
+            acc_q, secs_q = run_stance_and_eval(ds, stance_pipe_int8)
+            print(f"int8 vs fp32: accuracy {acc_q:.4f} vs {acc:.4f} ({acc_q - acc:+.4f}), "
+                  f"time {secs_q:.1f}s vs {secs:.1f}s")
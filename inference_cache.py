@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# inference_cache.py
+"""
+Persistent cache of Hugging Face pipeline outputs, shared by the NER and
+stance scripts.
+
+    from inference_cache import cached
+    ner_pipe = cached(pipeline("ner", model=MODEL_DIR, aggregation_strategy="simple"))
+    ner_pipe(text)            # same call / same output as the plain pipeline
+    ner_pipe(texts, batch_size=16)
+
+Results are stored per text under
+    (model id, model revision, task, pipeline params, call args, text hash)
+in an sqlitedict file, so re-running an evaluation only runs the model on
+texts it has not seen with exactly that model and those settings. For a local
+model directory (ner-finetuned/, stance-finetuned/) the "revision" is the size
+and mtime of its files, so retraining invalidates the old entries.
+
+    INFERENCE_CACHE_PATH     cache file (default .inference_cache.sqlite)
+    INFERENCE_CACHE_MAX_MB   size budget; oldest entries are dropped (default 1024)
+    INFERENCE_CACHE=0        bypass the cache entirely
+
+`python inference_cache.py` prints the number of entries and their size;
+`python inference_cache.py --clear` empties the cache.
+"""
+import argparse
+import hashlib
+import os
+
+from sqlitedict import SqliteDict
+
+CACHE_PATH   = os.environ.get("INFERENCE_CACHE_PATH", ".inference_cache.sqlite")
+MAX_MB       = float(os.environ.get("INFERENCE_CACHE_MAX_MB", 1024))
+ENABLED      = os.environ.get("INFERENCE_CACHE", "1") != "0"
+TABLE        = "outputs"
+
+# call kwargs that change how a pipeline runs but not what it returns
+RUNTIME_KWARGS = {"batch_size", "num_workers"}
+LOOKUP_CHUNK   = 500     # keys per SELECT ... IN (...)
+
+
+def source_revision(name_or_path, config):
+    """Hub commit hash, or a stat fingerprint of a local model directory."""
+    commit = getattr(config, "_commit_hash", None)
+    if commit:
+        return commit
+    if not os.path.isdir(name_or_path):
+        return ""
+    files = []
+    for name in sorted(os.listdir(name_or_path)):
+        st = os.stat(os.path.join(name_or_path, name))
+        files.append((name, st.st_size, st.st_mtime_ns))
+    return hashlib.blake2b(repr(files).encode(), digest_size=16).hexdigest()
+
+
+def model_revision(model):
+    # `variant` is set by quantize.load_model ("int8"); plain models are fp32
+    return source_revision(model.name_or_path, model.config), getattr(model, "variant", "fp32")
+
+
+def text_keys(params, texts):
+    """One cache key per text; `params` must cover everything else the output depends on."""
+    prefix = hashlib.blake2b(repr(params).encode(), digest_size=16).digest()
+    return [
+        hashlib.blake2b(prefix + text.encode("utf8"), digest_size=20).hexdigest()
+        for text in texts
+    ]
+
+
+class InferenceCache:
+    """sqlitedict of pickled per-text outputs with a total-size budget."""
+
+    def __init__(self, path=CACHE_PATH, max_mb=MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * (1 << 20))
+        self.db = SqliteDict(path, tablename=TABLE, autocommit=False)
+        self.hits = self.misses = 0
+        self._bytes = None      # running total of stored value bytes, see put_many
+
+    def get_many(self, keys):
+        """{key: output} for the keys that are cached."""
+        found = {}
+        for i in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[i:i + LOOKUP_CHUNK]
+            query = f'SELECT key, value FROM "{TABLE}" WHERE key IN ({",".join("?" * len(chunk))})'
+            for key, value in self.db.conn.select(query, chunk):
+                found[key] = self.db.decode(value)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        if self._bytes is None:
+            self._bytes = self.size()[1]
+        query = f'REPLACE INTO "{TABLE}" (key, value) VALUES (?, ?)'
+        for key, output in items:
+            value = self.db.encode(output)
+            self.db.conn.execute(query, (key, value))
+            # overwritten keys are counted twice; evict() recounts exactly
+            self._bytes += len(value)
+        self.db.commit()
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def size(self):
+        """(entries, bytes) currently stored."""
+        count, total = self.db.conn.select_one(
+            f'SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM "{TABLE}"'
+        )
+        return count, total
+
+    def evict(self):
+        """Drop the oldest entries (by last write) until under 90% of the budget."""
+        _, total = self.size()
+        self._bytes = total
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * 0.9)
+        freed, last_rowid = 0, None
+        for rowid, size in self.db.conn.select(f'SELECT rowid, LENGTH(value) FROM "{TABLE}" ORDER BY rowid'):
+            freed += size
+            last_rowid = rowid
+            if freed >= excess:
+                break
+        self.db.conn.execute(f'DELETE FROM "{TABLE}" WHERE rowid <= ?', (last_rowid,))
+        self.db.commit()
+        self._bytes = total - freed
+
+    def clear(self):
+        self.db.clear()
+        self.db.commit()
+        self._bytes = 0
+
+
+class CachedPipeline:
+    """
+    Drop-in wrapper around a transformers pipeline. A single string goes
+    through the pipeline as a single string and a list (or any other iterable)
+    as a list, so outputs keep exactly the shape of the uncached call; only
+    the texts missing from the cache reach the model.
+    """
+
+    def __init__(self, pipe, cache):
+        self.pipe = pipe
+        self.cache = cache
+        # also exposed so callers can keep using pipe.tokenizer, pipe.model ...
+        self.tokenizer = pipe.tokenizer
+        self.model = pipe.model
+        self._model_key = (
+            pipe.task,
+            pipe.model.name_or_path,
+            model_revision(pipe.model),
+            sorted(pipe._preprocess_params.items()),
+            sorted(pipe._forward_params.items()),
+            sorted(pipe._postprocess_params.items()),
+        )
+
+    def _keys(self, texts, args, kwargs, single):
+        call = {k: v for k, v in kwargs.items() if k not in RUNTIME_KWARGS}
+        return text_keys((self._model_key, args, sorted(call.items()), single), texts)
+
+    def __call__(self, inputs, *args, **kwargs):
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        keys = self._keys(texts, args, kwargs, single)
+        found = self.cache.get_many(keys)
+
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        if missing:
+            if single:
+                outputs = [self.pipe(inputs, *args, **kwargs)]
+            else:
+                outputs = self.pipe([texts[i] for i in missing], *args, **kwargs)
+            new = [(keys[i], out) for i, out in zip(missing, outputs)]
+            self.cache.put_many(new)
+            found.update(new)
+
+        results = [found[key] for key in keys]
+        return results[0] if single else results
+
+    def __getattr__(self, name):
+        return getattr(self.pipe, name)
+
+
+_cache = None
+
+
+def shared_cache():
+    """The InferenceCache shared by every cached() pipeline, or None when INFERENCE_CACHE=0."""
+    global _cache
+    if not ENABLED:
+        return None
+    if _cache is None:
+        _cache = InferenceCache()
+    return _cache
+
+
+def cached(pipe):
+    """Wrap `pipe` with the shared on-disk cache (no-op when INFERENCE_CACHE=0)."""
+    cache = shared_cache()
+    return pipe if cache is None else CachedPipeline(pipe, cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the inference cache.")
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+
+    cache = InferenceCache()
+    if args.clear:
+        cache.clear()
+    count, total = cache.size()
+    print(f"{cache.path}: {count} entries, {total / (1 << 20):.1f} MB (budget {cache.max_bytes / (1 << 20):.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
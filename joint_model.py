@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# joint_model.py
+"""
+One encoder, two heads: NER (per-token BIO tags) and stance (per sentence).
+
+The separate ner-finetuned/ (BERT) and stance-finetuned/ (RoBERTa) models
+tokenize and encode every sentence twice. JointModel shares a single encoder
+between a token-classification head and a sequence-classification head, so
+one tokenizer call and one forward pass give both the spans and the stance.
+It is trained by finetune/fine_tune_joint.py into joint-finetuned/.
+
+    from joint_model import JointPipeline
+    joint = JointPipeline("joint-finetuned/")
+    for out in joint(texts):
+        out["entities"]   # like pipeline("ner", aggregation_strategy="simple")
+        out["stance"]     # like pipeline("text-classification"): {"label", "score"}
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import torch
+from torch import nn
+from transformers import AutoConfig, AutoModel, AutoTokenizer, PretrainedConfig, PreTrainedModel
+from transformers.utils import ModelOutput
+
+from bio_align import tag_spans
+from onnx_backend import softmax
+
+ENTITY_TYPES  = ["PER", "ORG", "LOC", "EVENT"]
+NER_LABELS    = ["O"] + [f"{p}-{t}" for t in ENTITY_TYPES for p in ("B", "I")]
+# same order as finetune/fine_tune_stance.py's label_map and the backend
+STANCE_LABELS = ["STANCE_NEG", "STANCE_NEU", "STANCE_POS"]
+MAX_LENGTH    = 512
+
+
+class JointConfig(PretrainedConfig):
+    model_type = "joint-ner-stance"
+
+    def __init__(self, encoder_config=None, ner_labels=None, stance_labels=None,
+                 ner_loss_weight=1.0, stance_loss_weight=1.0, classifier_dropout=0.1, **kwargs):
+        super().__init__(**kwargs)
+        self.encoder_config = encoder_config or {}
+        self.ner_labels = list(ner_labels or NER_LABELS)
+        self.stance_labels = list(stance_labels or STANCE_LABELS)
+        self.ner_loss_weight = ner_loss_weight
+        self.stance_loss_weight = stance_loss_weight
+        self.classifier_dropout = classifier_dropout
+        self.initializer_range = self.encoder_config.get("initializer_range", 0.02)
+
+    def build_encoder_config(self):
+        return AutoConfig.for_model(**self.encoder_config)
+
+
+AutoConfig.register(JointConfig.model_type, JointConfig)
+
+
+@dataclass
+class JointOutput(ModelOutput):
+    loss: Optional[torch.FloatTensor] = None
+    ner_logits: torch.FloatTensor = None
+    stance_logits: torch.FloatTensor = None
+
+
+class JointModel(PreTrainedModel):
+    """
+    Shared encoder -> token head (NER_LABELS) and first-token head
+    (STANCE_LABELS). The loss is the weighted sum of both cross-entropies;
+    -100 in `labels` / `stance_labels` masks a token or a sentence out, so
+    records with only spans or only a stance still train the other head.
+    """
+
+    config_class = JointConfig
+    base_model_prefix = "encoder"
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.encoder = AutoModel.from_config(config.build_encoder_config(), add_pooling_layer=False)
+        hidden = self.encoder.config.hidden_size
+        self.dropout = nn.Dropout(config.classifier_dropout)
+        self.ner_head = nn.Linear(hidden, len(config.ner_labels))
+        # same shape as the RoBERTa / BERT sequence classification heads
+        self.stance_head = nn.Sequential(
+            nn.Linear(hidden, hidden),
+            nn.Tanh(),
+            nn.Dropout(config.classifier_dropout),
+            nn.Linear(hidden, len(config.stance_labels)),
+        )
+        self.post_init()
+
+    @classmethod
+    def from_encoder(cls, checkpoint, ner_labels=NER_LABELS, stance_labels=STANCE_LABELS, **kwargs):
+        """New heads on top of a pretrained encoder checkpoint."""
+        encoder = AutoModel.from_pretrained(checkpoint, add_pooling_layer=False)
+        config = JointConfig(
+            encoder_config=encoder.config.to_dict(),
+            ner_labels=ner_labels,
+            stance_labels=stance_labels,
+            **kwargs,
+        )
+        model = cls(config)
+        model.encoder = encoder
+        return model
+
+    def _init_weights(self, module):
+        if isinstance(module, nn.Linear):
+            module.weight.data.normal_(mean=0.0, std=self.config.initializer_range)
+            if module.bias is not None:
+                module.bias.data.zero_()
+
+    def forward(self, input_ids=None, attention_mask=None, token_type_ids=None,
+                labels=None, stance_labels=None):
+        hidden = self.encoder(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids,
+        ).last_hidden_state
+        hidden = self.dropout(hidden)
+        ner_logits = self.ner_head(hidden)
+        stance_logits = self.stance_head(hidden[:, 0])
+
+        loss = None
+        if labels is not None or stance_labels is not None:
+            ce = nn.CrossEntropyLoss()      # ignore_index=-100
+            loss = ner_logits.new_zeros(())
+            if labels is not None:
+                ner_loss = ce(ner_logits.view(-1, ner_logits.size(-1)), labels.view(-1))
+                loss = loss + self.config.ner_loss_weight * ner_loss
+            if stance_labels is not None and (stance_labels != -100).any():
+                stance_loss = ce(stance_logits, stance_labels)
+                loss = loss + self.config.stance_loss_weight * stance_loss
+        return JointOutput(loss=loss, ner_logits=ner_logits, stance_logits=stance_logits)
+
+
+class JointPipeline:
+    """Spans and stance for a list of texts, one forward pass per batch."""
+
+    def __init__(self, model_dir, batch_size=32, device=None):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = JointModel.from_pretrained(model_dir).eval()
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.model.to(self.device)
+        self.batch_size = batch_size
+        self.ner_labels = self.model.config.ner_labels
+        self.stance_labels = self.model.config.stance_labels
+
+    def __call__(self, inputs, batch_size=None):
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        batch_size = batch_size or self.batch_size
+        results = [None] * len(texts)
+        # length-sorted, so each batch pads to roughly its own length
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for b in range(0, len(order), batch_size):
+            idx = order[b:b + batch_size]
+            for i, out in zip(idx, self._predict([texts[i] for i in idx])):
+                results[i] = out
+        return results[0] if single else results
+
+    @torch.inference_mode()
+    def _predict(self, texts):
+        enc = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=MAX_LENGTH,
+            return_offsets_mapping=True,
+            return_tensors="pt",
+        )
+        offsets = enc.pop("offset_mapping").tolist()
+        out = self.model(**{k: v.to(self.device) for k, v in enc.items()})
+        ner_probs = softmax(out.ner_logits.float().cpu().numpy())
+        stance_probs = softmax(out.stance_logits.float().cpu().numpy())
+
+        results = []
+        for row, text in enumerate(texts):
+            best = ner_probs[row].argmax(-1)
+            tags = [self.ner_labels[t] for t in best]
+            entities = [
+                {
+                    "entity_group": label,
+                    "score": float(np.mean([ner_probs[row, t, best[t]] for t in tokens])),
+                    "word": text[start:end],
+                    "start": start,
+                    "end": end,
+                }
+                for start, end, label, tokens in tag_spans(offsets[row], tags)
+            ]
+            s = int(stance_probs[row].argmax())
+            results.append({
+                "entities": entities,
+                "stance": {"label": self.stance_labels[s], "score": float(stance_probs[row, s])},
+            })
+        return results
@@ -2,6 +2,10 @@ import json
 from seqeval.metrics import classification_report
 from transformers import pipeline, AutoModelForTokenClassification, AutoTokenizer
 
+from bio_align import bio_tags, entity_spans
+from inference_cache import cached
+from quantize import load_model
+
 
 def merge_doccano_jsonls():
     # load phase 1
@@ -34,28 +38,11 @@ def merge_doccano_jsonls():
 
 # Function to convert gold spans to token-level BIO labels
 def align_labels_to_tokens(entities, tokens, offsets):
-    labels = ["O"] * len(tokens)
-    for ent in entities:
-        start, end, label = ent["start_offset"], ent["end_offset"], ent["label"]
-        for idx, (tok_start, tok_end) in enumerate(offsets):
-            if tok_start == start:
-                labels[idx] = f"B-{label}"
-            elif tok_start > start and tok_end <= end:
-                labels[idx] = f"I-{label}"
-    return labels
+    return bio_tags(offsets, entity_spans(entities))
 
 # Function to align predicted entities to BIO token labels
 def preds_to_bio(preds, offsets):
-    labels = ["O"] * len(offsets)
-    for ent in preds:
-        ent_label = ent["entity_group"]
-        ent_start, ent_end = ent["start"], ent["end"]
-        for i, (tok_start, tok_end) in enumerate(offsets):
-            if tok_start == ent_start:
-                labels[i] = f"B-{ent_label}"
-            elif tok_start > ent_start and tok_end <= ent_end:
-                labels[i] = f"I-{ent_label}"
-    return labels
+    return bio_tags(offsets, entity_spans(preds))
     
 def main():
     # 1. Load the combined gold dataset
@@ -70,8 +57,8 @@ def main():
     # 2. Initialize Hugging Face NER pipeline with a pre-trained model
     model_name = "ner-finetuned/"  # you can swap to another model
     tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForTokenClassification.from_pretrained(model_name)
-    ner_pipeline = pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")
+    model = load_model(AutoModelForTokenClassification, model_name)  # int8 with INFERENCE_QUANTIZE=1
+    ner_pipeline = cached(pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple"))
 
     # 3. Prepare texts and gold labels
     texts = [item["text"] for item in gold_data]
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# onnx_backend.py
+"""
+ONNX export of the fine-tuned models and an ONNX Runtime backend to run them.
+
+    python onnx_backend.py export [ner-finetuned/ stance-finetuned/]
+    python onnx_backend.py check  [ner-finetuned/ stance-finetuned/]
+
+`export` writes <model_dir>-onnx/ (model.onnx with dynamic batch and sequence
+axes, plus the tokenizer and config), then runs the parity check. `check`
+compares the ONNX model against the torch one on sample sentences: the
+max logit difference must stay within PARITY_ATOL, the argmax must agree,
+and the ONNX pipelines below must return the same labels and spans as the
+transformers pipelines.
+
+    from onnx_backend import load_pipeline
+    ner_pipe = load_pipeline("ner", "ner-finetuned/", aggregation_strategy="simple")
+
+With INFERENCE_BACKEND=onnx, load_pipeline returns OnnxTokenClassificationPipeline /
+OnnxTextClassificationPipeline. They take the same calls and return the
+same outputs as the "ner" (aggregation_strategy="simple") and
+"text-classification" pipelines, so the evaluators, inference_cache and the
+backend's /infer can use either. Otherwise it returns the plain transformers
+pipeline. onnxruntime is only imported when an ONNX pipeline is built.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+from transformers import AutoConfig, AutoTokenizer
+
+BACKEND       = os.environ.get("INFERENCE_BACKEND", "torch")
+OPSET         = 14
+PARITY_ATOL   = 1e-3
+PARITY_FILE   = "bootstrapped_labels_2.0.jsonl"
+PARITY_TEXTS  = 64
+INPUT_NAMES   = ("input_ids", "attention_mask", "token_type_ids")
+_LEGACY       = object()    # text-classification called without top_k
+
+
+def onnx_dir_for(model_dir):
+    return model_dir.rstrip("/") + "-onnx"
+
+
+def softmax(logits):
+    # same shift-by-max form as the transformers pipelines
+    maxes = np.max(logits, axis=-1, keepdims=True)
+    shifted_exp = np.exp(logits - maxes)
+    return shifted_exp / shifted_exp.sum(axis=-1, keepdims=True)
+
+
+def _is_token_classifier(config):
+    return any("TokenClassification" in arch for arch in (config.architectures or []))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Runtime
+# ──────────────────────────────────────────────────────────────────────────────
+
+class _OnnxModel:
+    """Enough of a model for inference_cache: name, config and a variant tag."""
+
+    def __init__(self, model_dir, onnx_dir):
+        import onnxruntime as ort
+
+        self.name_or_path = model_dir
+        self.config = AutoConfig.from_pretrained(onnx_dir)
+        self.variant = "onnx"
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(onnx_dir, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def logits(self, encoded):
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        return self.session.run(["logits"], feeds)[0]
+
+
+class _OnnxPipeline:
+    def __init__(self, model_dir, onnx_dir=None, batch_size=8):
+        onnx_dir = onnx_dir or onnx_dir_for(model_dir)
+        if not os.path.exists(os.path.join(onnx_dir, "model.onnx")):
+            raise FileNotFoundError(f"{onnx_dir}/model.onnx missing; run: python onnx_backend.py export {model_dir}")
+        self.model = _OnnxModel(model_dir, onnx_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        self.batch_size = batch_size
+        self.id2label = self.model.config.id2label
+        self._preprocess_params = {}
+        self._forward_params = {}
+
+    def _batches(self, texts, batch_size, **tok_kwargs):
+        """(indices, encoding, logits) per length-sorted batch."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for b in range(0, len(order), batch_size):
+            idx = order[b:b + batch_size]
+            enc = self.tokenizer([texts[i] for i in idx], padding=True, return_tensors="np", **tok_kwargs)
+            yield idx, enc, self.model.logits(enc)
+
+    def __call__(self, inputs, batch_size=None):
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        outputs = self._run(texts, batch_size or self.batch_size)
+        return outputs[0] if single else outputs
+
+
+class OnnxTokenClassificationPipeline(_OnnxPipeline):
+    """ONNX Runtime equivalent of pipeline("ner", aggregation_strategy="simple")."""
+
+    task = "ner"
+
+    def __init__(self, model_dir, onnx_dir=None, batch_size=8, aggregation_strategy="simple",
+                 ignore_labels=("O",)):
+        if str(aggregation_strategy).lower().rsplit(".", 1)[-1] != "simple":
+            raise ValueError("the ONNX NER pipeline only implements aggregation_strategy='simple'")
+        super().__init__(model_dir, onnx_dir, batch_size)
+        self.ignore_labels = list(ignore_labels)
+        self._postprocess_params = {"aggregation_strategy": "simple", "ignore_labels": self.ignore_labels}
+
+    def _run(self, texts, batch_size):
+        results = [None] * len(texts)
+        for idx, enc, logits in self._batches(
+            texts, batch_size, truncation=True,
+            return_offsets_mapping=True, return_special_tokens_mask=True,
+        ):
+            for row, i in enumerate(idx):
+                results[i] = self._entities(enc, row, logits[row])
+        return results
+
+    def _entities(self, enc, row, logits):
+        n = int(enc["attention_mask"][row].sum())
+        scores = softmax(logits[:n])
+        entities = []
+        for t in range(n):
+            if enc["special_tokens_mask"][row][t]:
+                continue
+            label = int(scores[t].argmax())
+            start, end = (int(x) for x in enc["offset_mapping"][row][t])
+            entities.append({
+                "entity": self.id2label[label],
+                "score": scores[t][label],
+                "word": self.tokenizer.convert_ids_to_tokens(int(enc["input_ids"][row][t])),
+                "start": start,
+                "end": end,
+            })
+        groups = [g for g in self._group(entities)
+                  if g["entity_group"] not in self.ignore_labels]
+        return groups
+
+    @staticmethod
+    def _tag(name):
+        if name.startswith("B-"):
+            return "B", name[2:]
+        if name.startswith("I-"):
+            return "I", name[2:]
+        return "I", name
+
+    def _group(self, entities):
+        groups, current = [], []
+        for entity in entities:
+            if current:
+                bi, tag = self._tag(entity["entity"])
+                _, last_tag = self._tag(current[-1]["entity"])
+                if tag != last_tag or bi == "B":
+                    groups.append(self._merge(current))
+                    current = []
+            current.append(entity)
+        if current:
+            groups.append(self._merge(current))
+        return groups
+
+    def _merge(self, entities):
+        return {
+            "entity_group": entities[0]["entity"].split("-", 1)[-1],
+            "score": np.nanmean([e["score"] for e in entities]),
+            "word": self.tokenizer.convert_tokens_to_string([e["word"] for e in entities]),
+            "start": entities[0]["start"],
+            "end": entities[-1]["end"],
+        }
+
+
+class OnnxTextClassificationPipeline(_OnnxPipeline):
+    """ONNX Runtime equivalent of pipeline("text-classification")."""
+
+    task = "text-classification"
+
+    def __init__(self, model_dir, onnx_dir=None, batch_size=8, top_k=_LEGACY):
+        super().__init__(model_dir, onnx_dir, batch_size)
+        self.top_k = top_k
+        self._postprocess_params = {} if top_k is _LEGACY else {"top_k": top_k}
+
+    def __call__(self, inputs, batch_size=None, top_k=_LEGACY, truncation=True):
+        top_k = self.top_k if top_k is _LEGACY else top_k
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        outputs = self._run(texts, batch_size or self.batch_size, top_k, truncation)
+        if single:
+            # like transformers: a bare string without top_k still gets a list
+            return [outputs[0]] if top_k is _LEGACY else outputs[0]
+        return outputs
+
+    def _run(self, texts, batch_size, top_k=_LEGACY, truncation=True):
+        config = self.model.config
+        results = [None] * len(texts)
+        for idx, enc, logits in self._batches(texts, batch_size, truncation=truncation):
+            if config.problem_type == "multi_label_classification" or config.num_labels == 1:
+                scores = 1.0 / (1.0 + np.exp(-logits))
+            else:
+                scores = softmax(logits)
+            for row, i in enumerate(idx):
+                results[i] = self._labels(scores[row], top_k)
+        return results
+
+    def _labels(self, scores, top_k):
+        if top_k is _LEGACY:
+            best = int(scores.argmax())
+            return {"label": self.id2label[best], "score": scores[best].item()}
+        ranked = [{"label": self.id2label[i], "score": score.item()} for i, score in enumerate(scores)]
+        ranked.sort(key=lambda x: x["score"], reverse=True)
+        return ranked if top_k is None else ranked[:top_k]
+
+
+def load_pipeline(task, model_dir, backend=None, **kwargs):
+    """A transformers pipeline, or its ONNX Runtime equivalent when backend is "onnx"."""
+    backend = backend or BACKEND
+    if backend == "onnx":
+        if task in ("ner", "token-classification"):
+            return OnnxTokenClassificationPipeline(model_dir, **kwargs)
+        if task in ("text-classification", "sentiment-analysis"):
+            return OnnxTextClassificationPipeline(model_dir, **kwargs)
+        raise ValueError(f"no ONNX pipeline for task {task!r}")
+    from transformers import pipeline
+
+    kwargs.setdefault("tokenizer", model_dir)
+    return pipeline(task, model=model_dir, **kwargs)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Export + parity
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _torch_model(model_dir):
+    from transformers import AutoModelForSequenceClassification, AutoModelForTokenClassification
+
+    config = AutoConfig.from_pretrained(model_dir)
+    model_cls = AutoModelForTokenClassification if _is_token_classifier(config) else AutoModelForSequenceClassification
+    return model_cls.from_pretrained(model_dir).eval()
+
+
+def export(model_dir, onnx_dir=None):
+    import torch
+
+    onnx_dir = onnx_dir or onnx_dir_for(model_dir)
+    os.makedirs(onnx_dir, exist_ok=True)
+    model = _torch_model(model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    sample = tokenizer(["A short one.", "A somewhat longer sample sentence for tracing."],
+                       padding=True, return_tensors="pt")
+    names = [n for n in INPUT_NAMES if n in sample]
+
+    class Logits(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(names, inputs))).logits
+
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    axes["logits"] = {0: "batch", 1: "sequence"} if _is_token_classifier(model.config) else {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            Logits(), tuple(sample[n] for n in names), os.path.join(onnx_dir, "model.onnx"),
+            input_names=names, output_names=["logits"], dynamic_axes=axes,
+            opset_version=OPSET, do_constant_folding=True,
+        )
+    tokenizer.save_pretrained(onnx_dir)
+    model.config.save_pretrained(onnx_dir)
+    print(f"Exported {model_dir} -> {onnx_dir}/model.onnx")
+    return onnx_dir
+
+
+def _parity_texts():
+    if os.path.exists(PARITY_FILE):
+        with open(PARITY_FILE, encoding="utf8") as f:
+            texts = [json.loads(line)["text"] for _, line in zip(range(PARITY_TEXTS), f)]
+        if texts:
+            return texts
+    return [
+        "The mayor of Abila met with representatives of GAStech on Tuesday.",
+        "Protesters gathered outside the Kronos Federal Police headquarters.",
+        "POK leaders denied any role in the disappearance.",
+        "Officials said the investigation would continue.",
+    ]
+
+
+def check_parity(model_dir, onnx_dir=None):
+    """Raise AssertionError if the ONNX model drifts from the torch one."""
+    import torch
+    from transformers import pipeline
+
+    onnx_dir = onnx_dir or onnx_dir_for(model_dir)
+    texts = _parity_texts()
+    model = _torch_model(model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    token_level = _is_token_classifier(model.config)
+    onnx_pipe = (OnnxTokenClassificationPipeline if token_level else OnnxTextClassificationPipeline)(model_dir, onnx_dir)
+
+    # 1) raw logits, padded batch
+    enc = tokenizer(texts, padding=True, truncation=True, return_tensors="np")
+    with torch.no_grad():
+        expected = model(**{k: torch.from_numpy(v) for k, v in enc.items()}).logits.numpy()
+    got = onnx_pipe.model.logits(enc)
+    mask = enc["attention_mask"].astype(bool) if token_level else np.ones(len(texts), dtype=bool)
+    diff = float(np.abs(expected - got)[mask].max())
+    agree = float((expected.argmax(-1) == got.argmax(-1))[mask].mean())
+    print(f"{model_dir}: max |logit diff| {diff:.2e}, argmax agreement {agree:.4f} over {len(texts)} texts")
+    assert diff <= PARITY_ATOL, f"logits differ by {diff} (> {PARITY_ATOL})"
+    assert agree == 1.0, "argmax differs between torch and ONNX"
+
+    # 2) pipeline outputs
+    if token_level:
+        ref = pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")(texts)
+        out = onnx_pipe(texts)
+        key = lambda ents: [(e["entity_group"], e["start"], e["end"]) for e in ents]
+    else:
+        ref = pipeline("text-classification", model=model, tokenizer=tokenizer)(texts, truncation=True)
+        out = onnx_pipe(texts)
+        key = lambda res: res["label"]
+    mismatches = sum(key(a) != key(b) for a, b in zip(ref, out))
+    print(f"{model_dir}: pipeline outputs differ on {mismatches}/{len(texts)} texts")
+    assert mismatches == 0, "ONNX pipeline output differs from the transformers pipeline"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export fine-tuned models to ONNX and check parity.")
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("models", nargs="*", default=["ner-finetuned/", "stance-finetuned/"])
+    args = parser.parse_args()
+
+    for model_dir in args.models:
+        if args.command == "export":
+            export(model_dir)
+        check_parity(model_dir)
+
+
+if __name__ == "__main__":
+    main()
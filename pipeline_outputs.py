@@ -0,0 +1,56 @@
+# pipeline_outputs.py
+"""
+Transformers pipeline outputs -> the `spans` / `stance` / `score` fields of a
+prediction record, shared by the zero-shot bootstrap, the corpus labeler and
+the backend's /infer so they all write the same span and stance labels.
+
+    from pipeline_outputs import to_prediction, to_spans
+    rec.update(to_prediction(entities, stance))     # one text's NER entities + top stance
+    rec["spans"] = to_spans(entities)               # spans only
+
+Entity groups outside SPAN_LABELS (e.g. MISC) are dropped. Stance labels from
+the fine-tuned stance model ("LABEL_2", "negative", "POS"...) and from the
+joint model (already STANCE_*) all map onto STANCE_NEG / STANCE_NEU / STANCE_POS.
+"""
+
+# pipeline entity_group -> span label in the records
+SPAN_LABELS = {
+    "PER":   "PERSON",
+    "ORG":   "ORG",
+    "LOC":   "LOC",
+    "EVENT": "EVENT",
+}
+# Class order the stance model was fine-tuned with (finetune/fine_tune_stance.py).
+STANCE_BY_ID = ["STANCE_NEG", "STANCE_NEU", "STANCE_POS"]
+
+
+def to_spans(entities):
+    """[{"start", "end", "label"}] from one text's aggregated NER entities."""
+    return [
+        {"start": e["start"], "end": e["end"], "label": SPAN_LABELS[e["entity_group"]]}
+        for e in entities
+        if e["entity_group"] in SPAN_LABELS
+    ]
+
+
+def normalize_stance(raw):
+    """Map a stance pipeline label ('negative', 'LABEL_2', 'STANCE_POS'...) onto STANCE_*."""
+    r = raw.lower()
+    if r.startswith("stance_"):
+        r = r[len("stance_"):]
+    if r.startswith("label_") and r[6:].isdigit() and int(r[6:]) < len(STANCE_BY_ID):
+        return STANCE_BY_ID[int(r[6:])]
+    if r.startswith("neg"):
+        return "STANCE_NEG"
+    if r.startswith("pos"):
+        return "STANCE_POS"
+    return "STANCE_NEU"
+
+
+def to_prediction(entities, stance):
+    """spans / stance / score for one text from its NER entities and top stance."""
+    return {
+        "stance": normalize_stance(stance["label"]),
+        "score": float(stance["score"]),
+        "spans": to_spans(entities),
+    }
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# quantize.py
+"""
+Optional dynamic INT8 quantization of the NER / stance models for CPU inference.
+
+    from quantize import load_model
+    model = load_model(AutoModelForTokenClassification, "ner-finetuned/")
+
+With INFERENCE_QUANTIZE=1 every nn.Linear of the model is replaced by a
+dynamically quantized int8 version (torch.quantization.quantize_dynamic):
+roughly 4x smaller linear weights and faster matmuls on CPU, at some cost in
+accuracy that the evaluators report next to the fp32 numbers. Otherwise
+load_model is plain `from_pretrained`.
+
+The quantized state dict is saved under .quantized_models/, keyed by the
+model's revision (hub commit, or the size / mtime of a local model
+directory's files) and the torch version, so later runs skip the fp32 load
+and the quantization pass.
+
+`python quantize.py ner-finetuned/ stance-finetuned/` fills the cache ahead of time.
+"""
+import argparse
+import hashlib
+import os
+
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoModelForTokenClassification
+
+from inference_cache import source_revision
+
+ENABLED   = os.environ.get("INFERENCE_QUANTIZE", "0") == "1"
+CACHE_DIR = os.environ.get("INFERENCE_QUANTIZE_CACHE", ".quantized_models")
+
+
+def quantize_linear(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def cache_path(model_cls, name_or_path, config):
+    key = repr((model_cls.__name__, source_revision(name_or_path, config), torch.__version__))
+    digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+    name = name_or_path.strip("/").replace("/", "--")
+    return os.path.join(CACHE_DIR, f"{name}-int8-{digest}.pt")
+
+
+def load_model(model_cls, name_or_path, quantize=None):
+    """`model_cls.from_pretrained(name_or_path)`, int8-quantized when enabled."""
+    if quantize is None:
+        quantize = ENABLED
+    if not quantize:
+        return model_cls.from_pretrained(name_or_path)
+
+    config = AutoConfig.from_pretrained(name_or_path)
+    path = cache_path(model_cls, name_or_path, config)
+    if os.path.exists(path):
+        # rebuild the quantized module structure, then drop in the cached weights
+        model = quantize_linear(model_cls.from_config(config))
+        model.load_state_dict(torch.load(path, weights_only=False))
+    else:
+        model = quantize_linear(model_cls.from_pretrained(name_or_path))
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        torch.save(model.state_dict(), path + ".tmp")
+        os.replace(path + ".tmp", path)
+    model.variant = "int8"      # keeps inference_cache entries apart from fp32
+    return model.eval()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize fine-tuned models and cache the int8 weights.")
+    parser.add_argument("models", nargs="*", default=["ner-finetuned/", "stance-finetuned/"])
+    args = parser.parse_args()
+
+    for name in args.models:
+        config = AutoConfig.from_pretrained(name)
+        arch = (config.architectures or [""])[0]
+        model_cls = AutoModelForTokenClassification if "TokenClassification" in arch else AutoModelForSequenceClassification
+        load_model(model_cls, name, quantize=True)
+        print(f"{name} -> {cache_path(model_cls, name, config)}")
+
+
+if __name__ == "__main__":
+    main()
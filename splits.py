@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# splits.py
+"""
+One DEV / TEST / HOLDOUT split of the bootstrapped records, shared by the NER
+and stance evaluators so their results are on the same sentences.
+
+    from splits import load_splits
+    dev_set, test_set = load_splits("dev", "test")
+
+The split is computed once and written to eval_splits.json: for every record
+of bootstrapped_labels_2.0.jsonl not in the gold file, its uid
+("filename|date|sentence_index"), split tag, and byte offset / length in the
+JSONL. Evaluators then seek straight to the lines of their split instead of
+parsing the whole file. The file is rebuilt only if the JSONL or the gold file
+changes (checked by size and mtime, then by content hash), and the split
+itself is deterministic, so a rebuild of the same data gives the same split.
+
+The split is stratified by stance: per stance label, 10% DEV, 10% TEST and
+the rest HOLDOUT. It is the split inference/real_stance_inference.py used to
+compute on its own; real_ner_inference.py's shuffle split is replaced by it.
+
+`python splits.py` builds the file if needed and prints the split sizes;
+`--rebuild` forces a rebuild.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+from collections import defaultdict
+
+ORIGINAL_FILE = "bootstrapped_labels_2.0.jsonl"
+GOLD_300_FILE = "phase1+2_gold.jsonl"
+SPLITS_FILE   = "eval_splits.json"
+SPLITS        = ("dev", "test", "holdout")
+DEV_FRAC      = 0.1
+TEST_FRAC     = 0.1
+SEED          = 42
+
+
+def article_uid(rec):
+    """uid of the article a record comes from; gold records exclude whole articles."""
+    return f"{rec['metadata']['filename']}|{rec['metadata']['date']}"
+
+
+def record_uid(rec):
+    return f"{article_uid(rec)}|{rec['metadata']['sentence_index']}"
+
+
+def file_state(path, with_hash=True):
+    st = os.stat(path)
+    state = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if with_hash:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        state["blake2b"] = h.hexdigest()
+    return state
+
+
+def load_gold_ids(path=GOLD_300_FILE):
+    """Return set of uid = 'filename|date' for the 300 gold examples."""
+    with open(path) as f:
+        return {article_uid(json.loads(line)) for line in f}
+
+
+def stratified_split(entries, dev_frac=DEV_FRAC, test_frac=TEST_FRAC, seed=SEED):
+    """
+    entries: [(stance, item), ...]. Per stance, carve off dev+test as a pool,
+    then split the pool into dev vs test. Returns {split: [item, ...]}.
+    """
+    from sklearn.model_selection import train_test_split
+
+    by_label = defaultdict(list)
+    for stance, item in entries:
+        by_label[stance].append(item)
+
+    out = {name: [] for name in SPLITS}
+    pool_frac = dev_frac + test_frac
+    for lbl, items in by_label.items():
+        pool, hold = train_test_split(
+            items, test_size=1 - pool_frac, random_state=seed, stratify=[lbl] * len(items)
+        )
+        dev, test = train_test_split(
+            pool, test_size=test_frac / pool_frac, random_state=seed, stratify=[lbl] * len(pool)
+        )
+        out["dev"].extend(dev)
+        out["test"].extend(test)
+        out["holdout"].extend(hold)
+
+    # shuffle to mix labels
+    random.seed(seed)
+    for name in SPLITS:
+        random.shuffle(out[name])
+    return out
+
+
+def build(original_path=ORIGINAL_FILE, gold_path=GOLD_300_FILE, path=SPLITS_FILE):
+    """Split the unseen records and write the manifest; returns it."""
+    gold_ids = load_gold_ids(gold_path)
+    entries = []
+    with open(original_path, "rb") as f:
+        offset = 0
+        for line in f:
+            rec = json.loads(line)
+            if article_uid(rec) not in gold_ids:
+                stance = rec["stance"].replace("STANCE_", "")
+                entries.append((stance, {"uid": record_uid(rec), "offset": offset, "length": len(line)}))
+            offset += len(line)
+
+    records = []
+    for name, items in stratified_split(entries).items():
+        records.extend(dict(item, split=name) for item in items)
+    manifest = {
+        "source": original_path,
+        "source_state": file_state(original_path),
+        "gold": gold_path,
+        "gold_state": file_state(gold_path),
+        "params": {"dev_frac": DEV_FRAC, "test_frac": TEST_FRAC, "seed": SEED},
+        "records": records,
+    }
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+def _unchanged(saved, path):
+    state = file_state(path, with_hash=False)
+    if (state["size"], state["mtime_ns"]) == (saved["size"], saved["mtime_ns"]):
+        return True
+    # same size but touched (e.g. a fresh checkout): compare the content
+    return state["size"] == saved["size"] and file_state(path)["blake2b"] == saved["blake2b"]
+
+
+def _is_current(manifest, original_path, gold_path):
+    return (
+        manifest["source"] == original_path
+        and manifest["gold"] == gold_path
+        and manifest["params"] == {"dev_frac": DEV_FRAC, "test_frac": TEST_FRAC, "seed": SEED}
+        and _unchanged(manifest["source_state"], original_path)
+        and _unchanged(manifest["gold_state"], gold_path)
+    )
+
+
+_manifest = None
+
+
+def load_manifest(original_path=ORIGINAL_FILE, gold_path=GOLD_300_FILE, path=SPLITS_FILE, rebuild=False):
+    """The split manifest, built if missing or out of date; kept in memory after the first call."""
+    global _manifest
+    if _manifest is not None and not rebuild:
+        return _manifest
+    manifest = None
+    if not rebuild and os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if not _is_current(manifest, original_path, gold_path):
+            print(f"{original_path} or {gold_path} changed; rebuilding {path}")
+            manifest = None
+    if manifest is None:
+        manifest = build(original_path, gold_path, path)
+    _manifest = manifest
+    return manifest
+
+
+def split_sizes():
+    counts = dict.fromkeys(SPLITS, 0)
+    for entry in load_manifest()["records"]:
+        counts[entry["split"]] += 1
+    return counts
+
+
+def load_split(name):
+    """Records of one split, in split order, read by seeking to their lines."""
+    manifest = load_manifest()
+    entries = [e for e in manifest["records"] if e["split"] == name]
+    out = [None] * len(entries)
+    with open(manifest["source"], "rb") as f:
+        # read in file order, put back in split order
+        for i in sorted(range(len(entries)), key=lambda i: entries[i]["offset"]):
+            f.seek(entries[i]["offset"])
+            out[i] = json.loads(f.read(entries[i]["length"]))
+    return out
+
+
+def load_splits(*names):
+    return [load_split(name) for name in names]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build / show the shared evaluation split.")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    load_manifest(rebuild=args.rebuild)
+    sizes = split_sizes()
+    print(f"{SPLITS_FILE}: " + ", ".join(f"{name} {n}" for name, n in sizes.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# worker_pool.py
+"""
+Run a labeling function over records in a pool of worker processes.
+
+Each worker builds its own model once (`init_fn()`, in the worker) and caps
+torch at `threads` intra-op threads, so N workers x threads stays within the
+machine's cores instead of every process fighting over all of them. Records
+are grouped by article (metadata source + filename) into tasks, so an
+article's sentences always go through the same worker, and the outputs are
+put back in the original record order.
+
+    from worker_pool import label_records
+    spans = label_records(records, load_ner, annotate, workers=8)
+
+`label_fn(state, texts)` gets the object `init_fn` returned and a list of
+texts and must return one output per text. Both functions must be defined
+at module level (the pool uses the spawn start method), and a script using
+them needs an `if __name__ == "__main__":` guard.
+"""
+import multiprocessing as mp
+import os
+import time
+
+TASK_SIZE = 64      # sentences per task (whole articles, so tasks may be larger)
+
+_state = None
+
+
+def _init_worker(init_fn, threads):
+    global _state
+    import torch
+
+    torch.set_num_threads(threads)
+    _state = init_fn()
+
+
+def _run_task(task):
+    label_fn, indices, texts = task
+    return indices, label_fn(_state, texts)
+
+
+def article_key(rec):
+    md = rec.get("metadata") or {}
+    return md.get("source"), md.get("filename")
+
+
+def shard_by_article(records, task_size=TASK_SIZE):
+    """Lists of record indices; an article is never split across two lists."""
+    articles = {}
+    for i, rec in enumerate(records):
+        articles.setdefault(article_key(rec), []).append(i)
+    task = []
+    for indices in articles.values():
+        task.extend(indices)
+        if len(task) >= task_size:
+            yield task
+            task = []
+    if task:
+        yield task
+
+
+def label_records(records, init_fn, label_fn, workers=1, threads=None, text_key="text"):
+    """`label_fn` outputs for every record, in record order."""
+    texts = [rec[text_key] for rec in records]
+    if workers <= 1:
+        return label_fn(init_fn(), texts)
+
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    print(f"Labeling {len(records)} records with {workers} workers x {threads} threads")
+    results = [None] * len(records)
+    done, start = 0, time.perf_counter()
+    tasks = (
+        (label_fn, indices, [texts[i] for i in indices])
+        for indices in shard_by_article(records)
+    )
+    with mp.get_context("spawn").Pool(workers, _init_worker, (init_fn, threads)) as pool:
+        for indices, outputs in pool.imap_unordered(_run_task, tasks):
+            for i, out in zip(indices, outputs):
+                results[i] = out
+            done += len(indices)
+            rate = done / (time.perf_counter() - start)
+            print(f"  {done}/{len(records)} records ({rate:.1f}/s)", end="\r")
+    print()
+    return results
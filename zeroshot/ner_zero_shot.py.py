@@ -1,49 +1,52 @@
 # bootstrap_labels.py
 
+import argparse
 import json
+import os
+import sys
 import torch
-from transformers import pipeline
+from transformers import AutoModelForTokenClassification, pipeline
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from inference_cache import cached
+from pipeline_outputs import to_spans
+from quantize import load_model
+from worker_pool import label_records
 
 # 1) Load pipelines
-ner_pipe = pipeline(
-    "ner",
-    model="dslim/bert-base-NER",
-    tokenizer="dslim/bert-base-NER",
-    aggregation_strategy="first",
-    device=0 if torch.cuda.is_available() else -1
-)
-
-# 2) Read seed JSONL
-seed = [json.loads(line) for line in open("zero_shot_sentiments_v2.jsonl", encoding="utf8")]
-
-# 3) Annotate
-bootstrapped = []
-for record in seed:
-    text = record["text"]
-    # a) NER spans
-    ents = ner_pipe(text)
-    # normalize labels to match our tags
-    spans = []
-    for e in ents:
-        tag = e["entity_group"]
-        label = {
-        "PER":  "PERSON",
-        "ORG":  "ORG",
-        "LOC":  "LOC",
-        "EVENT": "EVENT" 
-        }.get(tag)
-
-        if not label:
-            continue
-
-        spans.append({"start": e["start"], "end": e["end"], "label": label})
-
-    record.update({"spans": spans})
-    bootstrapped.append(record)
-
-# 4) Write out for review
-with open("bootstrapped_labels_2.0.jsonl", "w", encoding="utf8") as f:
-    for rec in bootstrapped:
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-
-print(f"Wrote {len(bootstrapped)} bootstrapped records")
\ No newline at end of file
+# (module level, so worker_pool's spawned workers can pickle them by name)
+def load_ner():
+    return cached(pipeline(
+        "ner",
+        model=load_model(AutoModelForTokenClassification, "dslim/bert-base-NER"),
+        tokenizer="dslim/bert-base-NER",
+        aggregation_strategy="first",
+        device=0 if torch.cuda.is_available() else -1
+    ))
+
+def annotate(ner_pipe, texts):
+    # a) NER spans, normalized to our tags (pipeline_outputs.SPAN_LABELS)
+    return [to_spans(ents) for ents in ner_pipe(texts)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1, help="processes, each with its own model")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads per worker (default: cores / workers)")
+    args = parser.parse_args()
+
+    # 2) Read seed JSONL
+    seed = [json.loads(line) for line in open("zero_shot_sentiments_v2.jsonl", encoding="utf8")]
+
+    # 3) Annotate (sharded by article across workers, merged in seed order)
+    bootstrapped = []
+    all_spans = label_records(seed, load_ner, annotate, args.workers, args.threads)
+    for record, spans in zip(seed, all_spans):
+        record.update({"spans": spans})
+        bootstrapped.append(record)
+
+    # 4) Write out for review
+    with open("bootstrapped_labels_2.0.jsonl", "w", encoding="utf8") as f:
+        for rec in bootstrapped:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    print(f"Wrote {len(bootstrapped)} bootstrapped records")
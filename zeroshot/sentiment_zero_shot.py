@@ -1,9 +1,27 @@
 #!/usr/bin/env python3
+import argparse
 import json
-from transformers import pipeline, AutoTokenizer
+import os
+import sys
+from itertools import islice
+import numpy as np
+import torch
+from transformers import pipeline, AutoModelForSequenceClassification, AutoTokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # repo root
+from inference_cache import cached, model_revision, shared_cache, text_keys
+from quantize import load_model
+
+parser = argparse.ArgumentParser(description="Zero-shot stance labels for the doccano seed.")
+parser.add_argument("--check", type=int, default=0, metavar="N",
+                    help="also run the first N records through classify_chunked and "
+                         "stop if the batched result differs")
+args = parser.parse_args()
 
 # --- setup
-zsp = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+zsp = cached(pipeline("zero-shot-classification",
+                    model=load_model(AutoModelForSequenceClassification, "facebook/bart-large-mnli"),
+                    tokenizer="facebook/bart-large-mnli"))
 candidate_labels = ["positive","negative","neutral"]
 mapping = {"positive":"STANCE_POS","negative":"STANCE_NEG","neutral":"STANCE_NEU"}
 
@@ -37,17 +55,105 @@ def classify_chunked(text, max_len=128, stride=64):
             best_lbl, best_sc = lbl, sc
     return best_lbl, best_sc
 
+# --- batched: all (chunk, template, label) NLI pairs of many texts at once
+# Same result as classify_chunked on each text, but the 3 templates x 3 labels
+# per chunk become rows of large padded batches instead of 9 serial forward
+# passes, and the template averaging / best-chunk pick is done in numpy.
+BATCH_SIZE = 32     # premise/hypothesis pairs per forward pass
+BLOCK      = 256    # records classified together
+
+model = zsp.model
+model.eval()
+entail_id = next((i for lbl, i in model.config.label2id.items() if lbl.lower().startswith("entail")), -1)
+# hypothesis ids, tokenized once: [template][label]
+hyp_ids = [[tok(tmpl.format(lbl), add_special_tokens=False)["input_ids"] for lbl in candidate_labels]
+           for tmpl in templates]
+
+def pair_ids(premise, hypothesis):
+    # <s> premise </s></s> hypothesis </s>, premise cut first if too long (as the pipeline does)
+    overflow = len(premise) + len(hypothesis) + tok.num_special_tokens_to_add(pair=True) - tok.model_max_length
+    if overflow > 0:
+        premise = premise[:len(premise) - overflow]
+    return tok.build_inputs_with_special_tokens(premise, hypothesis)
+
+def entail_logits(pairs):
+    out = np.empty(len(pairs), dtype=np.float32)
+    order = sorted(range(len(pairs)), key=lambda i: len(pairs[i]))   # little padding per batch
+    with torch.no_grad():
+        for b in range(0, len(order), BATCH_SIZE):
+            idx = order[b:b + BATCH_SIZE]
+            batch = tok.pad({"input_ids": [pairs[i] for i in idx]}, return_tensors="pt")
+            batch = {k: v.to(model.device) for k, v in batch.items()}
+            out[idx] = model(**batch).logits.float().cpu().numpy()[:, entail_id]
+    return out
+
+def classify_chunked_batch(texts, max_len=128, stride=64):
+    enc = tok(texts, return_overflowing_tokens=True,
+              max_length=max_len, stride=stride, truncation=True)
+    owner = np.asarray(enc["overflow_to_sample_mapping"])
+    # decode + re-encode each window once, like classify_chunked does before
+    # the pipeline sees it (BART's decode -> encode is not always the identity)
+    premises = tok(tok.batch_decode(enc["input_ids"], skip_special_tokens=True),
+                   add_special_tokens=False)["input_ids"]
+    pairs = [pair_ids(p, h) for p in premises for row in hyp_ids for h in row]
+
+    T, L = len(templates), len(candidate_labels)
+    entail = entail_logits(pairs).reshape(-1, T, L)
+    exp = np.exp(entail)
+    probs = (exp / exp.sum(-1, keepdims=True)).astype(np.float64)   # softmax over labels, per template
+    total = probs[:, 0]
+    for t in range(1, T):               # summed in template order, as sum(v) does
+        total = total + probs[:, t]
+    avg = total / T
+    chunk_label = avg.argmax(-1)        # first max, like max(avg, key=avg.get)
+    chunk_score = avg.max(-1)
+
+    results = []
+    bounds = np.searchsorted(owner, np.arange(len(texts) + 1))
+    for i in range(len(texts)):
+        c = bounds[i] + chunk_score[bounds[i]:bounds[i + 1]].argmax()   # first best chunk
+        results.append((mapping[candidate_labels[chunk_label[c]]], float(chunk_score[c])))
+    return results
+
+# --- cached: only texts not classified before (same model, revision, templates,
+# labels and windowing) go through classify_chunked_batch
+cache = shared_cache()
+
+def classify_chunked_cached(texts, max_len=128, stride=64):
+    if cache is None:
+        return classify_chunked_batch(texts, max_len, stride)
+    params = ("classify_chunked", model.name_or_path, model_revision(model),
+              templates, candidate_labels, mapping, max_len, stride)
+    keys = text_keys(params, texts)
+    found = cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    if missing:
+        results = classify_chunked_batch([texts[i] for i in missing], max_len, stride)
+        new = [(keys[i], res) for i, res in zip(missing, results)]
+        cache.put_many(new)
+        found.update(new)
+    return [found[key] for key in keys]
+
 # --- run on unseen
 IN = "doccano_seed.jsonl"
 OUT= "zero_shot_sentiments_v2.jsonl"
 with open(IN) as fin, open(OUT,"w") as fout:
-    for line in fin:
-        rec = json.loads(line)
-        text = rec["text"]
+    checked = 0
+    while True:
+        recs = [json.loads(line) for line in islice(fin, BLOCK)]
+        if not recs:
+            break
         # pick one strategy:
-        lbl, sc = classify_chunked(text)  # or classify_ensemble(text)
-        rec["stance_zero_shot"] = lbl
-        rec["zero_shot_score"]   = sc
-        fout.write(json.dumps(rec)+"\n")
+        results = classify_chunked_cached([rec["text"] for rec in recs])  # or classify_chunked / classify_ensemble per text
+        for rec, (lbl, sc) in zip(recs, results):
+            if checked < args.check:
+                ref_lbl, ref_sc = classify_chunked(rec["text"])
+                if ref_lbl != lbl or abs(ref_sc - sc) >= 1e-4:
+                    raise RuntimeError(f"batched result {lbl} {sc:.4f} differs from classify_chunked "
+                                       f"{ref_lbl} {ref_sc:.4f} for: {rec['text']!r}")
+                checked += 1
+            rec["stance_zero_shot"] = lbl
+            rec["zero_shot_score"]   = sc
+            fout.write(json.dumps(rec)+"\n")
 
 print("Wrote improved zero-shot labels →", OUT)
\ No newline at end of file